@@ -0,0 +1,71 @@
+# app_logging.py
+# Logging for the whole app. Log calls only put the record on a queue; a
+# background listener formats it as one JSON object per line and writes it to
+# a size-rotated log.txt, so no save, login or export waits on the disk.
+# Records can carry structured fields through extra=: event, user, item_id
+# and duration_ms.
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FILE = "log.txt"
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+
+STRUCTURED_FIELDS = ("event", "user", "item_id", "duration_ms")
+
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    # The stock QueueHandler formats the message on the calling thread; the
+    # listener lives in the same process, so hand it the record untouched and
+    # let the message be built on the background thread
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(filename=LOG_FILE, level=logging.INFO, max_bytes=MAX_LOG_BYTES, backups=LOG_BACKUPS):
+    global _listener
+    if _listener is not None:
+        return
+
+    file_handler = RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(DeferredQueueHandler(records))
+
+    _listener = QueueListener(records, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+# Flushes whatever is still queued; called automatically at exit
+def stop_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
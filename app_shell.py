@@ -0,0 +1,84 @@
+# app_shell.py
+# The one Tk root of the application. Login, registration and the inventory
+# screens are frames inside it that are built once, cached and swapped in and
+# out, so logging out and back in costs a repack instead of a new window, a new
+# mainloop and a new database connection.
+import importlib
+import threading
+
+import customtkinter as ctk
+
+from db_worker import DatabaseWorker
+from login_system import LoginSystem, restore_login_failures
+from login_throttle import PERSIST_FAILURES
+
+# How long after the first window appears the inventory modules start loading
+PRELOAD_DELAY_MS = 300
+
+
+# Factory for the shell's worker; runs on the worker thread
+def open_database():
+    from database import Database
+    return Database()
+
+
+# Imports the inventory screen and its services on a background thread while
+# the user is typing, so opening it after login doesn't wait on them
+def preload_inventory():
+    threading.Thread(target=importlib.import_module, args=("inventory",),
+                     name="grocerify-preload", daemon=True).start()
+
+
+class AppShell:
+    def __init__(self):
+        # Start the database worker first so opening the file overlaps building the window.
+        # It serves the login and registration screens for the life of the app.
+        self.worker = DatabaseWorker(open_database)
+        self.worker.submit("create_default_admin")
+        if PERSIST_FAILURES:
+            self.worker.submit(restore_login_failures)
+
+        ctk.set_default_color_theme("green")
+        self.root = ctk.CTk()
+        self.root.wm_iconbitmap("grocerify_logo.ico")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.current = None  # frame on screen
+        self.login_system = LoginSystem(self)
+        self.inventory_screens = {}  # role -> InventoryManager, reused by every login with that role
+        self.login_system.show_login()
+
+    # Puts frame on screen in place of the current one
+    def show(self, frame, title, geometry, resizable=True, padding=0):
+        if self.current is not frame:
+            if self.current is not None:
+                self.current.pack_forget()
+            frame.pack(fill="both", expand=True, padx=padding, pady=padding)
+            self.current = frame
+        self.root.title(title)
+        self.root.geometry(geometry)
+        self.root.resizable(resizable, resizable)
+
+    def open_inventory(self, username, role):
+        from inventory import InventoryManager
+        screen = self.inventory_screens.get(role)
+        if screen is None:
+            screen = self.inventory_screens[role] = InventoryManager(self, username, role)
+        screen.activate(username)
+
+    def logout(self):
+        # Dialogs opened from the inventory (history, dashboard...) belong to the session
+        for child in self.root.winfo_children():
+            if isinstance(child, ctk.CTkToplevel):
+                child.destroy()
+        self.login_system.show_login()
+
+    def close(self):
+        self.root.destroy()
+
+    def run(self):
+        self.root.after(PRELOAD_DELAY_MS, preload_inventory)
+        self.root.mainloop()
+        for screen in self.inventory_screens.values():
+            screen.worker.shutdown()
+        self.worker.shutdown()
@@ -0,0 +1,127 @@
+# auth.py
+# Password hashing for user accounts. Passwords are stored as salted scrypt
+# hashes ("scrypt$n$r$p$salt$hash") whose cost can be tuned per installation.
+# Accounts still holding an old unsalted sha256 hash are upgraded the next time
+# they log in. All of this is slow on purpose, so it must only ever run on the
+# database worker, never on the Tk thread.
+import argparse
+import hashlib
+import hmac
+import os
+import threading
+import time
+
+SCRYPT_N = 2 ** 14  # default CPU/memory cost, see calibrate()
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+def hash_password(password, n=SCRYPT_N):
+    salt = os.urandom(SALT_BYTES)
+    key = _scrypt(password, salt, n, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${n}${SCRYPT_R}${SCRYPT_P}${salt.hex()}${key.hex()}"
+
+
+# Returns (matches, needs_rehash). needs_rehash is set for legacy sha256
+# hashes and for scrypt hashes made with other cost parameters than n.
+def verify_password(password, stored, n=SCRYPT_N):
+    if stored.startswith("scrypt$"):
+        try:
+            _, stored_n, r, p, salt, key = stored.split("$")
+            stored_n, r, p = int(stored_n), int(r), int(p)
+            salt, key = bytes.fromhex(salt), bytes.fromhex(key)
+        except ValueError:
+            return False, False
+        matches = hmac.compare_digest(_scrypt(password, salt, stored_n, r, p, len(key)), key)
+        return matches, matches and (stored_n, r, p) != (n, SCRYPT_R, SCRYPT_P)
+
+    # Legacy unsalted sha256 hex digest
+    legacy = hashlib.sha256(password.encode()).hexdigest()
+    matches = hmac.compare_digest(legacy, stored)
+    return matches, matches
+
+
+def _scrypt(password, salt, n, r, p, dklen=KEY_BYTES):
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=dklen)
+
+
+# Picks the largest power-of-two scrypt cost that still hashes within
+# target_seconds on this machine
+def calibrate(target_seconds=0.25, min_n=2 ** 12, max_n=2 ** 20):
+    n = min_n
+    salt = os.urandom(SALT_BYTES)
+    while n < max_n:
+        started = time.perf_counter()
+        _scrypt("calibration", salt, n * 2, SCRYPT_R, SCRYPT_P)
+        if time.perf_counter() - started > target_seconds:
+            break
+        n *= 2
+    return n
+
+
+class CredentialCache:
+    # Remembers recently verified logins so a shared terminal doesn't pay the
+    # KDF on every login of the same clerk. Entries hold an HMAC of the
+    # password under a key that only exists in this process, are tied to the
+    # exact stored hash (a password change invalidates them) and expire.
+    def __init__(self, ttl_seconds=15 * 60, max_entries=256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._key = os.urandom(32)
+        self._entries = {}  # username -> (stored hash, password digest, expiry)
+        self._lock = threading.Lock()
+
+    def _digest(self, password):
+        return hmac.new(self._key, password.encode(), hashlib.sha256).digest()
+
+    def matches(self, username, password, stored):
+        with self._lock:
+            entry = self._entries.get(username)
+        if entry is None:
+            return False
+        cached_stored, digest, expires = entry
+        if cached_stored != stored or time.monotonic() > expires:
+            self.forget(username)
+            return False
+        return hmac.compare_digest(digest, self._digest(password))
+
+    def remember(self, username, password, stored):
+        entry = (stored, self._digest(password), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            if len(self._entries) >= self.max_entries and username not in self._entries:
+                # Drop the entry closest to expiring
+                oldest = min(self._entries, key=lambda name: self._entries[name][2])
+                del self._entries[oldest]
+            self._entries[username] = entry
+
+    def forget(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+
+credential_cache = CredentialCache()
+
+
+if __name__ == "__main__":
+    # Benchmarks this machine and stores the scrypt cost that keeps a login
+    # under the target latency, e.g. python auth.py --target-ms 250
+    parser = argparse.ArgumentParser(description="Tune the password hashing cost for this machine.")
+    parser.add_argument("--target-ms", type=int, default=250, help="longest acceptable hashing time per login")
+    parser.add_argument("--db", default="Grocerify_Database.db", help="database file to store the setting in")
+    parser.add_argument("--dry-run", action="store_true", help="only print the result")
+    args = parser.parse_args()
+
+    n = calibrate(args.target_ms / 1000)
+    started = time.perf_counter()
+    hash_password("benchmark", n)
+    print(f"scrypt n={n} hashes in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    if not args.dry_run:
+        from database import Database
+        db = Database(args.db)
+        db.set_setting("scrypt_n", n)
+        db.close_connection()
+        print(f"Saved to {args.db}; existing passwords are re-hashed on their next login")
@@ -0,0 +1,197 @@
+# benchmark.py
+# Times the data paths behind the screens on synthetic catalogs, headlessly:
+# the table refresh queries, the CSV export, single-item writes and logins.
+# Results are written as JSON so runs from two commits can be compared, e.g.
+#   python benchmark.py --sizes 1000,100000 --output before.json
+# Generated databases are kept in --data-dir and reused by later runs; they
+# use the real schema (Database.setup_tables plus every migration), so their
+# indexes and triggers are the ones the app runs with.
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from auth import credential_cache
+from database import Database
+from export_service import EXPORT_HEADERS, export_inventory_csv
+from import_service import ADD_CATEGORIES_QUERY, import_inventory_csv
+from inventory_repository import ITEM_ID_DIGITS, ITEM_ID_PREFIX, InventoryRepository, page_key
+from query_cache import inventory_cache
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+CATEGORIES = ["Meat", "Vegetables", "Fruits", "Dairy Products", "Beverages"]
+WORDS = ["Fresh", "Organic", "Whole", "Sliced", "Frozen", "Green", "Red", "Sweet", "Smoked", "Large",
+         "Milk", "Cheese", "Apple", "Banana", "Carrot", "Chicken", "Beef", "Juice", "Water", "Tomato",
+         "Yogurt", "Butter", "Pepper", "Onion", "Grape", "Pork", "Lettuce", "Cola", "Tea", "Melon"]
+BENCH_USER = "bench_admin"
+BENCH_PASSWORD = "bench-password"
+
+
+def synthetic_rows(count, seed=42):
+    # Deterministic, so every run and every commit benchmarks the same data
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for number in range(1, count + 1):
+        name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {number}"
+        added = start + timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        yield (f"{ITEM_ID_PREFIX}{number:0{ITEM_ID_DIGITS}d}", name, round(rng.uniform(0.25, 99.99), 2),
+               rng.randrange(0, 500), rng.choice(CATEGORIES), added.strftime("%Y-%m-%d %H:%M:%S"))
+
+
+# Fills the catalog through the CSV import, so the file holds what a real
+# import leaves behind, "import" history rows included
+def build_database(path, rows):
+    if os.path.exists(path):
+        os.remove(path)
+    db = Database(path)
+    db.insert_user(BENCH_USER, BENCH_PASSWORD, "bench@example.com", "admin")
+    # Added up front so the category IDs follow the menu order
+    db.conn.executemany(ADD_CATEGORIES_QUERY, [(category,) for category in CATEGORIES])
+    db.conn.commit()
+    with tempfile.TemporaryDirectory() as scratch:
+        source = os.path.join(scratch, "catalog.csv")
+        with open(source, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_HEADERS)
+            writer.writerows(synthetic_rows(rows))
+        import_inventory_csv(db, source, username=BENCH_USER)
+    db.conn.execute("PRAGMA optimize")
+    db.close_connection()
+
+
+# Returns the database for a catalog size, generating it the first time
+def database_for(size, data_dir, rebuild=False):
+    path = os.path.join(data_dir, f"bench_{size}.db")
+    if rebuild or not os.path.exists(path):
+        print(f"Generating {size:,} items in {path}...", file=sys.stderr)
+        started = time.perf_counter()
+        build_database(path, size)
+        print(f"  done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return path
+
+
+def measure(func, repeat, setup=None):
+    # Wall-clock milliseconds of each call; setup runs before every call and isn't timed
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def benchmark_catalog(path, size, repeat):
+    repository = InventoryRepository(Database(path), BENCH_USER)
+    results = {}
+    cold = inventory_cache.invalidate  # every query below goes to SQLite unless noted
+
+    # What refreshTable and scrolling run
+    middle = repository.fetch_page(limit=1, after=f"{ITEM_ID_PREFIX}{size // 2:0{ITEM_ID_DIGITS}d}")
+    middle_key = middle[0][0] if middle else None
+    results["refresh_first_page"] = measure(lambda: repository.fetch_page(limit=100), repeat, cold)
+    results["refresh_first_page_cached"] = measure(lambda: repository.fetch_page(limit=100), repeat)
+    results["scroll_middle_page"] = measure(lambda: repository.fetch_page(after=middle_key, limit=100), repeat, cold)
+    results["refresh_sorted_by_name"] = measure(lambda: repository.fetch_page(limit=100, sort="name"), repeat, cold)
+    named = repository.fetch_page(limit=100, sort="name")
+    results["scroll_sorted_by_name"] = measure(
+        lambda: repository.fetch_page(after=page_key(named[-1]), limit=100, sort="name"), repeat, cold)
+    results["refresh_price_descending"] = measure(
+        lambda: repository.fetch_page(limit=100, sort="price", descending=True), repeat, cold)
+    results["refresh_category_filter"] = measure(
+        lambda: repository.fetch_page(limit=100, category="Dairy Products"), repeat, cold)
+    results["refresh_search"] = measure(lambda: repository.fetch_page(limit=100, search="fresh milk"), repeat, cold)
+
+    # exportToExcel's pipeline, to a throwaway file
+    with tempfile.TemporaryDirectory() as scratch:
+        target = os.path.join(scratch, "export.csv")
+        export_repeat = max(1, repeat // 5) if size >= 100000 else repeat
+        results["export_csv"] = measure(lambda: export_inventory_csv(repository.db, target), export_repeat)
+
+    # Single-item writes, each one a transaction with its history row and triggers
+    ids = iter(range(size + 1, size + 1 + repeat))
+    inserted = []
+
+    def insert():
+        item_id = f"BENCH-{next(ids)}"
+        repository.insert_item((item_id, "Bench Item", 1.0, 10, "Meat", "2024-06-01 12:00:00"))
+        inserted.append(item_id)
+
+    results["insert_item"] = measure(insert, repeat)
+    updates = iter(inserted)
+    results["update_item"] = measure(
+        lambda: repository.update_item(next(updates), "Bench Item", 2.0, 3, "Fruits"), repeat)
+    deletes = iter(inserted)
+    results["delete_item"] = measure(lambda: repository.delete_item(next(deletes)), repeat)
+
+    # check_user_credentials, with and without the verified-login cache
+    forget = lambda: credential_cache.forget(BENCH_USER)
+    login = lambda: repository.db.check_user_credentials(BENCH_USER, BENCH_PASSWORD)
+    results["login_cold"] = measure(login, max(1, repeat // 5), forget)
+    results["login_cached"] = measure(login, repeat)
+
+    repository.close_connection()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Grocerify's data paths on synthetic catalogs.")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="comma-separated catalog sizes (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per operation")
+    parser.add_argument("--data-dir", default="bench_data", help="where generated databases are kept")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the databases even if they exist")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "catalogs": {},
+    }
+    for size in sizes:
+        path = database_for(size, args.data_dir, args.rebuild)
+        print(f"Benchmarking {size:,} items...", file=sys.stderr)
+        report["catalogs"][str(size)] = benchmark_catalog(path, size, args.repeat)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    for size, results in report["catalogs"].items():
+        print(f"\n{int(size):,} items")
+        for name, timing in results.items():
+            print(f"  {name:<28} median {timing['median_ms']:>10.3f} ms")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
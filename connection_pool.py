@@ -0,0 +1,131 @@
+# connection_pool.py
+# One process-wide place that opens, tunes and reuses SQLite connections.
+# Windows come and go on every login/logout; their connections are handed back
+# here instead of being leaked, and the next window picks them up again.
+import atexit
+import sqlite3
+import threading
+import time
+
+from metrics import metrics
+
+# Applied once to every new connection. WAL lets readers (refresh, export) run
+# while a writer commits, which is what several terminals sharing one file
+# need. WAL does not work on network file systems, keep the file on a local disk.
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",  # 64 MB page cache
+    "PRAGMA mmap_size = 268435456",  # 256 MB memory-mapped reads
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+]
+
+
+# Connection and cursor classes the pool opens connections with. A statement
+# is timed from execute() until its first fetch (the whole result for
+# fetchall), or until execute() returns for statements without a result set.
+class InstrumentedCursor(sqlite3.Cursor):
+    _pending = None  # (sql, started) of a SELECT whose rows haven't been fetched yet
+
+    def execute(self, sql, parameters=()):
+        if not metrics.enabled:
+            self._pending = None
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._finish_execute(sql, started)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        if not metrics.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._pending = None
+        metrics.record_query(sql, (time.perf_counter() - started) * 1000, max(self.rowcount, 0))
+        return self
+
+    def fetchone(self):
+        row = super().fetchone()
+        self._finish_fetch(0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._finish_fetch(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._finish_fetch(len(rows))
+        return rows
+
+    def _finish_execute(self, sql, started):
+        if self.description is not None:
+            self._pending = (sql, started)
+        else:
+            self._pending = None
+            metrics.record_query(sql, (time.perf_counter() - started) * 1000, max(self.rowcount, 0))
+
+    def _finish_fetch(self, rows):
+        if self._pending is not None:
+            sql, started = self._pending
+            self._pending = None
+            metrics.record_query(sql, (time.perf_counter() - started) * 1000, rows)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._idle = {}  # db_name -> connections nobody is using
+        self._lock = threading.Lock()
+
+    # Returns (connection, is_new). Connections may move between threads but
+    # are only ever used by whoever acquired them.
+    def acquire(self, db_name):
+        with self._lock:
+            idle = self._idle.get(db_name)
+            if idle:
+                return idle.pop(), False
+
+        # Every statement is timed for the diagnostics panel
+        conn = sqlite3.connect(db_name, check_same_thread=False, factory=InstrumentedConnection)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn, True
+
+    def release(self, db_name, conn):
+        if conn.in_transaction:
+            conn.rollback()
+
+        # In-memory databases vanish with their connection, so never share them
+        if db_name != ":memory:":
+            with self._lock:
+                idle = self._idle.setdefault(db_name, [])
+                if len(idle) < self.max_idle:
+                    idle.append(conn)
+                    return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+
+pool = ConnectionPool()
+atexit.register(pool.close_all)
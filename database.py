@@ -1,11 +1,47 @@
-import sqlite3
-import hashlib
+import logging
+from migrations import run_migrations, schema_version
+from connection_pool import pool
+from auth import SCRYPT_N, credential_cache, hash_password, verify_password
+from metrics import metrics
+
+# The queries the app runs all the time; none of them may scan a whole table.
+# An optional third element lists plan steps that are fine for that query,
+# such as scanning a table that only holds the rows currently of interest.
+HOT_QUERIES = [
+    ("SELECT * FROM inventory WHERE item_id > ? ORDER BY item_id LIMIT ?", ("", 100)),
+    ("SELECT * FROM inventory ORDER BY date_added DESC", ()),
+    ("SELECT * FROM inventory AS i WHERE i.category_id = (SELECT id FROM categories WHERE name = ?) "
+     "AND i.item_id > ? ORDER BY i.item_id LIMIT ?", ("Meat", "", 100)),
+    ("SELECT * FROM inventory WHERE (price, item_id) > (?, ?) ORDER BY price, item_id LIMIT ?", (0, "", 100)),
+    ("SELECT * FROM inventory WHERE (name, item_id) > (? COLLATE NOCASE, ?) ORDER BY name COLLATE NOCASE, item_id LIMIT ?", ("", "", 100)),
+    ("SELECT i.item_id FROM categories AS c CROSS JOIN inventory AS i INDEXED BY idx_inventory_by_category "
+     "ON i.category_id = c.id "
+     "WHERE (c.name, i.item_id) > (?, ?) ORDER BY c.name, i.item_id LIMIT ?", ("", "", 100)),
+    ("SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ? ORDER BY rowid LIMIT ?", ('"milk"*', 100)),
+    ("SELECT * FROM inventory AS i WHERE +i.rowid IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?) "
+     "AND (i.price, i.item_id) < (?, ?) ORDER BY i.price DESC, i.item_id DESC LIMIT ?", ('"milk"*', 0, "", 100)),
+    ("SELECT * FROM inventory AS i WHERE +i.rowid IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?) "
+     "AND i.item_id < ? ORDER BY i.item_id DESC LIMIT ?", ('"milk"*', "", 100)),
+    ("SELECT * FROM inventory WHERE name = ? COLLATE NOCASE", ("Milk",)),
+    ("SELECT * FROM stock_movements WHERE item_id = ? AND (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?", ("", "", 0, 100)),
+    ("SELECT * FROM stock_movements WHERE (ts, id) < (?, ?) ORDER BY ts DESC, id DESC LIMIT ?", ("", 0, 100)),
+    ("SELECT a.item_id, i.name FROM low_stock_alerts AS a CROSS JOIN inventory AS i ON i.item_id = a.item_id "
+     "ORDER BY a.quantity - a.threshold, a.item_id LIMIT ?", (500,),
+     {"SCAN a", "USE TEMP B-TREE FOR ORDER BY"}),
+    ("SELECT * FROM users WHERE username = ?", ("admin",)),
+    ("SELECT * FROM users WHERE email = ?", ("admin@example.com",)),
+]
 
 class Database:
     def __init__(self, db_name="Grocerify_Database.db"):
-        self.conn = sqlite3.connect(db_name)
+        # Connections come from the shared pool; only fresh ones need the schema check
+        self.db_name = db_name
+        self.conn, is_new = pool.acquire(db_name)
         self.cursor = self.conn.cursor()
-        self.setup_tables()
+        if is_new:
+            self.setup_tables()
+            self.migrate()
+            metrics.slow_query_ms = self.slow_query_threshold()
 
     def setup_tables(self):
         # Users table
@@ -32,11 +68,38 @@ class Database:
         """)
         self.conn.commit()
 
+    def schema_version(self):
+        return schema_version(self.conn)
+
+    # Applies pending schema migrations (see migrations.py)
+    def migrate(self):
+        # Re-check the hot queries whenever the schema changed
+        if run_migrations(self.conn):
+            for query, detail in self.check_query_plans():
+                logging.warning("Query plan for '%s' uses '%s'", query, detail, extra={"event": "query_plan"})
+
+    # Runs EXPLAIN QUERY PLAN over HOT_QUERIES and returns (query, plan step)
+    # for every step that still scans a table or sorts in a temp b-tree
+    def check_query_plans(self):
+        problems = []
+        for query, params, *allowed in HOT_QUERIES:
+            allowed = allowed[0] if allowed else set()
+            for row in self.cursor.execute("EXPLAIN QUERY PLAN " + query, params).fetchall():
+                detail = row[3]
+                if detail in allowed:
+                    continue
+                # A virtual table "scan" is answered by its own index (FTS5 MATCH)
+                if detail.startswith("SCAN") and "USING" not in detail and "VIRTUAL TABLE" not in detail:
+                    problems.append((query, detail))
+                elif "TEMP B-TREE" in detail:
+                    problems.append((query, detail))
+        return problems
+
     # Creates a default admin account if one does not exist
     def create_default_admin(self):
         self.cursor.execute("SELECT * FROM users WHERE username = 'admin'")
         if not self.cursor.fetchone():
-            hashed_password = hashlib.sha256('admin123'.encode()).hexdigest()
+            hashed_password = hash_password('admin123', self.scrypt_cost())
             self.cursor.execute("""
                 INSERT INTO users (username, password, email, role)
                 VALUES (?, ?, ?, ?)
@@ -44,20 +107,73 @@ class Database:
             self.conn.commit()
 
     def insert_user(self, username, password, email, role='user'):
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
+        hashed_password = hash_password(password, self.scrypt_cost())
         self.cursor.execute("""
             INSERT INTO users (username, password, email, role)
             VALUES (?, ?, ?, ?)
         """, (username, hashed_password, email, role))
         self.conn.commit()
 
+    # Verifies a login and returns (username, role), or None. Recently verified
+    # passwords skip the KDF; legacy or outdated hashes are upgraded in place.
     def check_user_credentials(self, username, password):
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
         self.cursor.execute("""
-            SELECT username, role FROM users 
-            WHERE username = ? AND password = ?
-        """, (username, hashed_password))
-        return self.cursor.fetchone()
+            SELECT password, role FROM users
+            WHERE username = ?
+        """, (username,))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        stored, role = row
+
+        if credential_cache.matches(username, password, stored):
+            return (username, role)
+
+        n = self.scrypt_cost()
+        matches, needs_rehash = verify_password(password, stored, n)
+        if not matches:
+            return None
+        if needs_rehash:
+            stored = hash_password(password, n)
+            self.cursor.execute("UPDATE users SET password = ? WHERE username = ?", (stored, username))
+            self.conn.commit()
+        credential_cache.remember(username, password, stored)
+        return (username, role)
+
+    def record_login_failure(self, username, ts):
+        self.cursor.execute("INSERT INTO login_failures (username, ts) VALUES (?, ?)", (username, ts))
+        self.conn.commit()
+
+    def clear_login_failures(self, username):
+        self.cursor.execute("DELETE FROM login_failures WHERE username = ?", (username,))
+        self.conn.commit()
+
+    # Drops failures older than since and returns the rest as (username, ts)
+    def load_login_failures(self, since):
+        self.cursor.execute("DELETE FROM login_failures WHERE ts < ?", (since,))
+        self.conn.commit()
+        self.cursor.execute("SELECT username, ts FROM login_failures ORDER BY ts")
+        return self.cursor.fetchall()
+
+    # scrypt cost tuned for this installation with "python auth.py"
+    def scrypt_cost(self):
+        return int(self.get_setting("scrypt_n", SCRYPT_N))
+
+    # Statements slower than this many milliseconds are logged (see metrics.py)
+    def slow_query_threshold(self):
+        return float(self.get_setting("slow_query_ms", metrics.slow_query_ms))
+
+    def get_setting(self, key, default=None):
+        self.cursor.execute("SELECT value FROM app_settings WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def set_setting(self, key, value):
+        self.cursor.execute("""
+            INSERT INTO app_settings (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+        """, (key, str(value)))
+        self.conn.commit()
 
     def update_last_login(self, username):
         self.cursor.execute("""
@@ -66,7 +182,19 @@ class Database:
         """, (username,))
         self.conn.commit()
     
+    def username_exists(self, username):
+        self.cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+        return self.cursor.fetchone() is not None
+
+    def email_exists(self, email):
+        self.cursor.execute("SELECT 1 FROM users WHERE email = ?", (email,))
+        return self.cursor.fetchone() is not None
+
+    # Hands the connection back to the pool for the next window to reuse
     def close_connection(self):
-        self.conn.close()
+        if self.conn is not None:
+            self.cursor.close()
+            pool.release(self.db_name, self.conn)
+            self.conn = None
 
     
\ No newline at end of file
@@ -0,0 +1,102 @@
+# db_worker.py
+# Runs database work on a dedicated thread so the Tk mainloop never waits on
+# SQLite. The worker thread is the only one that uses its Database, so the
+# pooled connection (opened with check_same_thread=False) is never used by two
+# threads at once; callers get a Future back, and deliver() hands the result to
+# the GUI by polling with window.after.
+import queue
+import threading
+import time
+import tkinter as tk
+from concurrent.futures import Future
+
+from metrics import metrics
+
+
+class DatabaseWorker:
+    def __init__(self, factory, name="grocerify-db"):
+        # factory() is called on the worker thread and builds the object every
+        # submitted function receives as its first argument, e.g. Database
+        self._tasks = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, args=(factory,), name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        # Runs func(resource, *args, **kwargs) on the worker thread. func may
+        # also be the name of a method of the resource, so callers don't have
+        # to import the resource's module, e.g. submit("update_last_login", name)
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("Database worker has been shut down"))
+            return future
+        self._tasks.put((future, func, args, kwargs, time.perf_counter()))
+        return future
+
+    def shutdown(self):
+        if not self._closed:
+            self._closed = True
+            self._tasks.put(None)
+
+    def _run(self, factory):
+        try:
+            resource = factory()
+        except Exception as e:
+            resource, startup_error = None, e
+        else:
+            startup_error = None
+
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                break
+            future, func, args, kwargs, submitted = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            if startup_error is not None:
+                future.set_exception(startup_error)
+                continue
+            # How long calls waited behind others shows up as db.queue_wait
+            started = time.perf_counter()
+            metrics.record("db.queue_wait", (started - submitted) * 1000)
+            if isinstance(func, str):
+                name = f"{type(resource).__name__}.{func}"
+                func = getattr(type(resource), func)
+            else:
+                name = getattr(func, "__qualname__", "call")
+            try:
+                future.set_result(func(resource, *args, **kwargs))
+            except BaseException as e:
+                metrics.increment("db.errors")
+                future.set_exception(e)
+            finally:
+                metrics.record("db." + name, (time.perf_counter() - started) * 1000)
+
+        if resource is not None:
+            resource.close_connection()
+
+
+def deliver(widget, future, on_done, on_error=None, interval=15):
+    # Polls the future from the Tk event loop and calls on_done(result) or
+    # on_error(exception) on the GUI thread once it finishes
+    def poll():
+        if not future.done():
+            schedule()
+            return
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            on_done(future.result())
+        elif on_error is not None:
+            on_error(error)
+        else:
+            raise error
+
+    def schedule():
+        try:
+            widget.after(interval, poll)
+        except tk.TclError:
+            pass  # The window was destroyed while the query was running
+
+    schedule()
@@ -0,0 +1,70 @@
+# export_service.py
+# Streams the inventory to a CSV file in fixed-size batches so memory stays flat
+# no matter how many rows are exported. Meant to run on the database worker.
+import csv
+import os
+
+EXPORT_HEADERS = ["Item ID", "Name", "Price", "Quantity", "Category", "Date Added"]
+
+# Dates are reformatted from "%Y-%m-%d %H:%M:%S" to "%Y-%m-%d %I:%M:%S %p" by
+# SQLite, so no row goes through datetime.strptime/strftime. Values in any other
+# format are exported unchanged.
+EXPORT_QUERY = """
+    SELECT
+        item_id,
+        name,
+        price,
+        quantity,
+        (SELECT name FROM categories WHERE id = i.category_id),
+        CASE WHEN date_added GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]'
+        THEN COALESCE(
+            strftime('%Y-%m-%d ', date_added)
+            || printf('%02d', (CAST(strftime('%H', date_added) AS INTEGER) + 11) % 12 + 1)
+            || strftime(':%M:%S ', date_added)
+            || CASE WHEN strftime('%H', date_added) < '12' THEN 'AM' ELSE 'PM' END,
+            date_added)
+        ELSE date_added END
+    FROM inventory AS i
+    ORDER BY date_added DESC
+"""
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def export_inventory_csv(db, file_path, progress=None, cancel_event=None, batch_size=5000):
+    # progress(written, total) is called after every batch from the worker
+    # thread; setting cancel_event stops the export and removes the partial file
+    cursor = db.conn.cursor()
+    total = cursor.execute("SELECT COUNT(*) FROM inventory").fetchone()[0]
+    written = 0
+
+    try:
+        with open(file_path, "w", newline="", encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(EXPORT_HEADERS)
+
+            cursor.execute(EXPORT_QUERY)
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ExportCancelled()
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+
+                # Format price to 2 decimal places
+                writer.writerows(
+                    (item_id, name, f"{float(price):.2f}", quantity, category, date_added)
+                    for item_id, name, price, quantity, category, date_added in batch
+                )
+                written += len(batch)
+                if progress is not None:
+                    progress(written, total)
+    except ExportCancelled:
+        os.remove(file_path)
+        raise
+    finally:
+        cursor.close()
+
+    return written
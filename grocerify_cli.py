@@ -0,0 +1,180 @@
+# grocerify_cli.py
+# Headless command line for the inventory, for scripts and cron jobs on
+# machines without a display, e.g.
+#   python grocerify_cli.py add "Whole Milk" 1.99 24 "Dairy Products"
+#   python grocerify_cli.py list --category Meat --sort price --desc
+#   python grocerify_cli.py export nightly.csv
+#   python grocerify_cli.py categories Bakery
+# It drives the same InventoryRepository as the GUI, so changes land in the
+# stock history and the rollups exactly like edits made on screen. Nothing
+# here may import customtkinter or tkinter.
+import argparse
+import getpass
+import logging
+import sqlite3
+import sys
+import time
+
+from app_logging import setup_logging
+from database import Database
+from export_service import EXPORT_HEADERS
+from inventory_repository import SORT_COLUMNS, InventoryRepository, page_key
+from metrics import metrics
+
+DEFAULT_DB = "Grocerify_Database.db"
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="grocerify", description="Manage the Grocerify inventory without the GUI.")
+    parser.add_argument("--db", default=DEFAULT_DB, help="database file (default: %(default)s)")
+    parser.add_argument("--user", default=None, help="name recorded in the stock history (default: the OS user)")
+    parser.add_argument("--metrics", metavar="FILE", help="write query timings and counters to FILE as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add an item")
+    add.add_argument("name")
+    add.add_argument("price", type=float)
+    add.add_argument("quantity", type=int)
+    add.add_argument("category")
+    add.add_argument("--item-id", help="item ID to use instead of a generated one")
+
+    update = commands.add_parser("update", help="change an item; omitted fields keep their value")
+    update.add_argument("item_id")
+    update.add_argument("--name")
+    update.add_argument("--price", type=float)
+    update.add_argument("--quantity", type=int)
+    update.add_argument("--category")
+
+    delete = commands.add_parser("delete", help="delete an item")
+    delete.add_argument("item_id")
+
+    listing = commands.add_parser("list", help="print items as tab-separated lines")
+    listing.add_argument("--search", default="", help="match the start of words in the item ID, name or category")
+    listing.add_argument("--category")
+    listing.add_argument("--sort", choices=sorted(SORT_COLUMNS), default="item_id")
+    listing.add_argument("--desc", action="store_true", help="sort in descending order")
+    listing.add_argument("--limit", type=int, default=None, help="stop after this many items")
+
+    export = commands.add_parser("export", help="write the inventory to a CSV file")
+    export.add_argument("file")
+
+    load = commands.add_parser("import", help="load a CSV file in the export format")
+    load.add_argument("file")
+
+    categories = commands.add_parser("categories", help="add categories, then print them all")
+    categories.add_argument("names", nargs="*", metavar="name", help="category to add if it doesn't exist yet")
+    return parser
+
+
+def add_item(repository, args):
+    item_id = args.item_id or repository.allocate_item_id()
+    date_added = time.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        repository.insert_item((item_id, args.name, args.price, args.quantity, args.category, date_added))
+    except sqlite3.IntegrityError:
+        raise ValueError(f"Item ID '{item_id}' already exists") from None
+    log_change("item_saved", repository, item_id, "saved new ID")
+    print(item_id)
+
+
+def update_item(repository, args):
+    current = repository.current_values(args.item_id)
+    if current is None:
+        raise LookupError(f"No item with ID '{args.item_id}'")
+    changes = (args.name, args.price, args.quantity, args.category)
+    values = [new if new is not None else old for new, old in zip(changes, current)]
+    repository.update_item(args.item_id, *values)
+    log_change("item_updated", repository, args.item_id, "updated ID")
+
+
+def delete_item(repository, args):
+    if repository.current_values(args.item_id) is None:
+        raise LookupError(f"No item with ID '{args.item_id}'")
+    repository.delete_item(args.item_id)
+    log_change("item_deleted", repository, args.item_id, "deleted item with ID")
+
+
+def list_items(repository, args, page_size=1000):
+    # Walks the same keyset pages as the GUI table, so memory stays flat
+    print("\t".join(EXPORT_HEADERS))
+    remaining = args.limit
+    after = None
+    while remaining is None or remaining > 0:
+        limit = page_size if remaining is None else min(page_size, remaining)
+        rows = repository.fetch_page(after=after, limit=limit, search=args.search, category=args.category,
+                                     sort=args.sort, descending=args.desc)
+        for row in rows:
+            print("\t".join(str(value) for value in row[:6]))
+        if len(rows) < limit:
+            break
+        after = page_key(rows[-1])
+        if remaining is not None:
+            remaining -= len(rows)
+
+
+def export_items(repository, args):
+    started = time.perf_counter()
+    count = repository.export_csv(args.file)
+    logging.info("User '%s' exported %s items to '%s'", repository.username, count, args.file,
+                 extra={"event": "export", "user": repository.username, "duration_ms": elapsed_ms(started)})
+    print(f"Exported {count} items to {args.file}")
+
+
+def import_items(repository, args):
+    started = time.perf_counter()
+    result = repository.import_csv(args.file)
+    logging.info("User '%s' imported %s items from '%s' (%s rejected)",
+                 repository.username, result.imported, args.file, result.rejected,
+                 extra={"event": "import", "user": repository.username, "duration_ms": elapsed_ms(started)})
+    print(f"Imported {result.imported} items, rejected {result.rejected}")
+    if result.rejected_path:
+        print(f"Rejected rows were saved to {result.rejected_path}")
+    return 1 if result.rejected else 0
+
+
+def list_categories(repository, args):
+    for name in args.names:
+        repository.add_category(name.strip())
+    for name in repository.fetch_categories():
+        print(name)
+
+
+def log_change(event, repository, item_id, action):
+    logging.info("User '%s' %s '%s' from the command line", repository.username, action, item_id,
+                 extra={"event": event, "user": repository.username, "item_id": item_id})
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+COMMANDS = {
+    "add": add_item,
+    "update": update_item,
+    "delete": delete_item,
+    "list": list_items,
+    "export": export_items,
+    "import": import_items,
+    "categories": list_categories,
+}
+
+
+# Returns the process exit code: 0 on success, 1 when the command failed or
+# an import rejected rows, 2 for bad arguments (from argparse)
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    repository = InventoryRepository(Database(args.db), args.user or getpass.getuser())
+    try:
+        return COMMANDS[args.command](repository, args) or 0
+    except (LookupError, ValueError, OSError, sqlite3.Error) as e:
+        print(f"grocerify: {e}", file=sys.stderr)
+    finally:
+        repository.close_connection()
+        if args.metrics:
+            metrics.dump(args.metrics)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
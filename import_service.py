@@ -0,0 +1,197 @@
+# import_service.py
+# Bulk-loads a CSV in the export format into the inventory. Rows are read and
+# validated in chunks and written with executemany inside one transaction per
+# chunk, upserting on item_id. Every item the chunk adds or changes gets an
+# "import" row in stock_movements in the same transaction, so imports show up
+# in the stock history like edits made on screen. Rows that fail validation
+# are copied to a "<file>.rejected.csv" side file with the reason. Meant to
+# run on the worker.
+import csv
+import os
+import re
+from datetime import datetime
+from operator import itemgetter
+
+from export_service import EXPORT_HEADERS
+
+# Rows name their category; categories the file introduces are added first
+# (ADD_CATEGORIES_QUERY), so every name resolves to an ID
+ADD_CATEGORIES_QUERY = "INSERT OR IGNORE INTO categories (name) VALUES (?)"
+
+# A chunk is staged in a temp table, one row per item ID (the last one in the
+# file wins), so its history rows are written with one INSERT ... SELECT
+# against the values it is about to replace, and the chunk is then applied
+# with one upsert. Items the file leaves unchanged aren't updated at all, so
+# re-importing a catalog doesn't run the search, stock and rollup triggers.
+STAGING_TABLE_QUERY = """
+    CREATE TEMP TABLE IF NOT EXISTS import_rows (
+        item_id TEXT PRIMARY KEY,
+        name TEXT,
+        price REAL,
+        quantity INTEGER,
+        category TEXT,
+        date_added TEXT
+    )
+"""
+
+STAGE_QUERY = "INSERT OR REPLACE INTO temp.import_rows VALUES (?, ?, ?, ?, ?, ?)"
+
+# Unchanged items get no history row
+MOVEMENTS_QUERY = """
+    INSERT INTO stock_movements (
+        item_id, ts, username, action,
+        old_name, old_price, old_quantity, old_category,
+        new_name, new_price, new_quantity, new_category,
+        quantity_delta
+    )
+    SELECT r.item_id, ?, ?, 'import',
+           i.name, i.price, i.quantity, (SELECT name FROM categories WHERE id = i.category_id),
+           r.name, r.price, r.quantity, r.category,
+           r.quantity - COALESCE(i.quantity, 0)
+    FROM temp.import_rows AS r LEFT JOIN inventory AS i ON i.item_id = r.item_id
+    WHERE i.item_id IS NULL OR i.name IS NOT r.name OR i.price IS NOT r.price OR i.quantity IS NOT r.quantity
+       OR i.category_id IS NOT (SELECT id FROM categories WHERE name = r.category)
+"""
+
+STAGED_UPSERT_QUERY = """
+    INSERT INTO inventory (item_id, name, price, quantity, category_id, date_added)
+    SELECT item_id, name, price, quantity, (SELECT id FROM categories WHERE name = category), date_added
+    FROM temp.import_rows WHERE true
+    ON CONFLICT(item_id) DO UPDATE SET
+        name = excluded.name,
+        price = excluded.price,
+        quantity = excluded.quantity,
+        category_id = excluded.category_id
+    WHERE name IS NOT excluded.name OR price IS NOT excluded.price
+       OR quantity IS NOT excluded.quantity OR category_id IS NOT excluded.category_id
+"""
+
+DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+class ImportCancelled(Exception):
+    pass
+
+
+class ImportResult:
+    # imported counts the items the import added or changed; duplicate and
+    # unchanged rows aren't written, so they aren't counted
+    def __init__(self, imported, rejected, rejected_path):
+        self.imported = imported
+        self.rejected = rejected
+        self.rejected_path = rejected_path
+
+
+# Turns an exported "2024-05-01 01:30:00 PM" (or an already stored
+# "2024-05-01 13:30:00") back into the stored format without strptime
+def parse_date(value, now):
+    if not value:
+        return now
+    if len(value) == 22:
+        suffix = value[20:]
+        hour = int(value[11:13]) if value[11:13].isdigit() else 0
+        if suffix not in ("AM", "PM") or not 1 <= hour <= 12:
+            raise ValueError("expected YYYY-MM-DD HH:MM:SS AM/PM")
+        if suffix == "PM":
+            hour = hour % 12 + 12
+        else:
+            hour = hour % 12
+        value = f"{value[:11]}{hour:02d}{value[13:19]}"
+    if not DATE_PATTERN.fullmatch(value):
+        raise ValueError("expected YYYY-MM-DD HH:MM:SS")
+    return value
+
+
+def validate_row(row, now):
+    try:
+        item_id, name, price, quantity, category, date_added = row
+    except ValueError:
+        raise ValueError(f"expected {len(EXPORT_HEADERS)} columns, got {len(row)}") from None
+    item_id = item_id.strip()
+    name = name.strip()
+    category = category.strip()
+    if not (item_id and name and category):
+        raise ValueError("item ID, name and category are required")
+    try:
+        price = float(price)
+        quantity = int(quantity)
+    except ValueError:
+        raise ValueError("invalid price or quantity format") from None
+    return (item_id, name, price, quantity, category, parse_date(date_added.strip(), now))
+
+
+def count_lines(file_path):
+    with open(file_path, "rb") as file:
+        return sum(block.count(b"\n") for block in iter(lambda: file.read(1 << 20), b""))
+
+
+def import_inventory_csv(db, file_path, progress=None, cancel_event=None, chunk_size=50000, username=None):
+    # progress(processed, total) is called after every chunk; cancelling stops
+    # before the next chunk, chunks already committed stay imported. username
+    # is recorded as the author of the history rows.
+    total = max(count_lines(file_path) - 1, 0)
+    rejected_path = os.path.splitext(file_path)[0] + ".rejected.csv"
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    imported = rejected = processed = 0
+    rejected_file = rejected_writer = None
+
+    try:
+        with open(file_path, newline="", encoding="utf-8-sig") as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None or [h.strip().lower() for h in header] != [h.lower() for h in EXPORT_HEADERS]:
+                raise ValueError("The file does not have the Grocerify export columns: " + ", ".join(EXPORT_HEADERS))
+
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ImportCancelled()
+
+                chunk = []
+                failures = []
+                for row in reader:
+                    try:
+                        chunk.append(validate_row(row, now))
+                    except ValueError as e:
+                        failures.append(row + [str(e)])
+                    if len(chunk) + len(failures) >= chunk_size:
+                        break
+                if not chunk and not failures:
+                    break
+
+                if chunk:
+                    # Writing in key order keeps the item_id B-tree inserts local;
+                    # the sort is stable so the last duplicate in the file still wins
+                    chunk.sort(key=itemgetter(0))
+                    cursor = db.conn.cursor()
+                    try:
+                        cursor.execute("BEGIN")
+                        cursor.executemany(ADD_CATEGORIES_QUERY, [(category,) for category in {row[4] for row in chunk}])
+                        cursor.execute(STAGING_TABLE_QUERY)
+                        cursor.executemany(STAGE_QUERY, chunk)
+                        cursor.execute(MOVEMENTS_QUERY, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), username))
+                        written = cursor.execute(STAGED_UPSERT_QUERY).rowcount
+                        cursor.execute("DELETE FROM temp.import_rows")
+                        db.conn.commit()
+                    except Exception:
+                        db.conn.rollback()
+                        raise
+                    finally:
+                        cursor.close()
+                    imported += written
+
+                if failures:
+                    if rejected_writer is None:
+                        rejected_file = open(rejected_path, "w", newline="", encoding="utf-8")
+                        rejected_writer = csv.writer(rejected_file)
+                        rejected_writer.writerow(EXPORT_HEADERS + ["Error"])
+                    rejected_writer.writerows(failures)
+                    rejected += len(failures)
+
+                processed += len(chunk) + len(failures)
+                if progress is not None:
+                    progress(processed, max(total, processed))
+    finally:
+        if rejected_file is not None:
+            rejected_file.close()
+
+    return ImportResult(imported, rejected, rejected_path if rejected else None)
@@ -1,45 +1,319 @@
 # inventory_module.py
 import customtkinter as ctk
-import random
 import logging
 from tkinter import messagebox, ttk, filedialog
 from database import Database
+from db_worker import DatabaseWorker, deliver
 from datetime import datetime
-from login_system import LoginSystem
+from paged_table import PagedTable
+from export_service import ExportCancelled
+from import_service import ImportCancelled
+from inventory_repository import InventoryRepository, capabilities_for, page_key
+from metrics import metrics
 import sqlite3
 import os
-import csv
+import threading
+import time
+
+# Category filter entry that shows every category; the categories themselves
+# come from the categories table (see loadCategories)
+ALL_CATEGORIES = "All Categories"
+
+# Treeview heading -> column the database sorts by when the heading is clicked
+COLUMN_SORTS = {
+    "Item Id": "item_id",
+    "Name": "name",
+    "Price": "price",
+    "Quantity": "quantity",
+    "Category": "category",
+    "Date": "date_added",
+}
+
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+class ProgressDialog:
+    # Small window showing how far a running export or import is, with a Cancel button
+    def __init__(self, parent, title, message):
+        # message is formatted with done= and total= row counts
+        self.message = message
+        self.cancel_event = threading.Event()
+        self.progress = (0, 0)  # (rows done, total rows), set from the worker thread
+
+        self.top = ctk.CTkToplevel(parent)
+        self.top.title(title)
+        self.top.geometry("360x150")
+        self.top.resizable(False, False)
+        self.top.transient(parent)
+        self.top.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.label = ctk.CTkLabel(self.top, text="Preparing...")
+        self.label.pack(pady=(20, 10))
+        self.bar = ctk.CTkProgressBar(self.top, width=300)
+        self.bar.set(0)
+        self.bar.pack(pady=5)
+        cancel_button = ctk.CTkButton(self.top, text="Cancel", command=self.cancel, fg_color="red", width=100)
+        cancel_button.pack(pady=10)
+
+    def report(self, done, total):
+        self.progress = (done, total)
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.label.configure(text="Cancelling...")
+
+    def watch(self, future):
+        # Refresh the bar from the Tk event loop until the work finishes
+        if future.done() or not self.top.winfo_exists():
+            return
+        done, total = self.progress
+        if total and not self.cancel_event.is_set():
+            self.bar.set(done / total)
+            self.label.configure(text=self.message.format(done=done, total=total))
+        self.top.after(100, self.watch, future)
+
+    def close(self):
+        self.top.destroy()
+
+def describe_movement(row):
+    # Turns a stock_movements row into the values shown in the history table;
+    # changed fields read "old -> new"
+    (movement_id, ts, username, action, item_id,
+     old_name, old_price, old_quantity, old_category,
+     new_name, new_price, new_quantity, new_category, delta) = row
+    fields = []
+    for old, new in ((old_name, new_name), (old_price, new_price),
+                     (old_quantity, new_quantity), (old_category, new_category)):
+        if old is None:
+            fields.append(new)
+        elif new is None or old == new:
+            fields.append(old)
+        else:
+            fields.append(f"{old} \u2192 {new}")
+    return (movement_id, ts, username or "", action.capitalize(), item_id, *fields, f"{delta:+d}")
+
+
+class HistoryWindow:
+    # Pages through stock_movements, newest first, with the same PagedTable as
+    # the inventory table
+    def __init__(self, parent, worker, item_id=None):
+        self.worker = worker
+        self.item_id = item_id
+
+        self.top = ctk.CTkToplevel(parent)
+        self.top.title(f"History of {item_id}" if item_id else "Inventory History")
+        self.top.geometry("1000x500")
+        self.top.transient(parent)
+
+        tree_frame = ttk.Frame(self.top)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        columns = ["Id", "When", "User", "Action", "Item Id", "Name", "Price", "Quantity", "Category", "Change"]
+        self.tree = ttk.Treeview(tree_frame, columns=columns, displaycolumns=columns[1:], show="headings", height=18)
+        for col in columns:
+            self.tree.column(col, anchor="w", width=140 if col == "When" else 95)
+            self.tree.heading(col, text=col, anchor="w")
+
+        y_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.table = PagedTable(self.tree, y_scrollbar, self.fetchPage, on_error=self.showLoadError,
+                                key_for=lambda row: (row[1], row[0]), name="history")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        y_scrollbar.grid(row=0, column=1, sticky="ns")
+        tree_frame.grid_rowconfigure(0, weight=1)
+        tree_frame.grid_columnconfigure(0, weight=1)
+
+        self.table.reset()
+
+    def fetchPage(self, **kwargs):
+        def fetch(repository):
+            return [describe_movement(row) for row in repository.fetch_movements(self.item_id, **kwargs)]
+        return self.worker.submit(fetch)
+
+    def showLoadError(self, error):
+        messagebox.showerror("Error", f"Failed to load the history: {str(error)}", parent=self.top)
+
+
+class DashboardWindow:
+    # Stock totals per category and items added per day, read from the rollup
+    # tables the database keeps up to date
+    def __init__(self, parent, worker):
+        self.top = ctk.CTkToplevel(parent)
+        self.top.title("Inventory Dashboard")
+        self.top.geometry("720x560")
+        self.top.transient(parent)
+
+        ctk.CTkLabel(self.top, text="Stock by Category",
+                     font=ctk.CTkFont(size=16, weight="bold")).pack(pady=(15, 5))
+        tree_frame = ttk.Frame(self.top)
+        tree_frame.pack(fill="x", padx=15)
+        columns = ["Category", "Items", "Units", "Stock Value"]
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=7)
+        for col in columns:
+            self.tree.column(col, anchor="w" if col == "Category" else "e", width=160)
+            self.tree.heading(col, text=col, anchor="w" if col == "Category" else "e")
+        self.tree.pack(fill="x")
+
+        ctk.CTkLabel(self.top, text="Items Added per Day",
+                     font=ctk.CTkFont(size=16, weight="bold")).pack(pady=(15, 5))
+        self.chart = ctk.CTkCanvas(self.top, height=220, bg="white", highlightthickness=0)
+        self.chart.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+
+        deliver(self.top, worker.submit(InventoryRepository.fetch_dashboard), self.show, self.showLoadError)
+
+    def show(self, figures):
+        categories, additions = figures
+        total_items = total_units = total_cents = 0
+        for category, items, units, cents in categories:
+            self.tree.insert("", "end", values=(category, f"{items:,}", f"{units:,}", f"{cents / 100:,.2f}"))
+            total_items += items
+            total_units += units
+            total_cents += cents
+        self.tree.insert("", "end", values=("Total", f"{total_items:,}", f"{total_units:,}", f"{total_cents / 100:,.2f}"))
+        self.top.update_idletasks()
+        self.drawAdditions(list(reversed(additions)))
+
+    def drawAdditions(self, additions):
+        # Simple bar chart, oldest day on the left
+        if not additions:
+            self.chart.create_text(10, 10, anchor="nw", text="No items yet")
+            return
+        width = max(self.chart.winfo_width(), 300)
+        height = max(self.chart.winfo_height(), 150)
+        top, bottom = 20, height - 40
+        slot = width / len(additions)
+        peak = max(count for day, count in additions)
+        for index, (day, count) in enumerate(additions):
+            x = index * slot
+            bar_top = bottom - (bottom - top) * count / peak
+            self.chart.create_rectangle(x + slot * 0.15, bar_top, x + slot * 0.85, bottom,
+                                        fill="#3a7ebf", outline="")
+            self.chart.create_text(x + slot / 2, bar_top - 2, anchor="s", text=str(count), font=("Arial", 8))
+            self.chart.create_text(x + slot / 2, bottom + 4, anchor="n", text=day[5:], font=("Arial", 8))
+
+    def showLoadError(self, error):
+        messagebox.showerror("Error", f"Failed to load the dashboard: {str(error)}", parent=self.top)
+
+
+class DiagnosticsWindow:
+    # Live view of the counters, latency percentiles and slow queries collected
+    # in metrics.py, refreshed every second while open
+    def __init__(self, parent, worker):
+        self.worker = worker
+
+        self.top = ctk.CTkToplevel(parent)
+        self.top.title("Diagnostics")
+        self.top.geometry("900x620")
+        self.top.transient(parent)
+
+        controls = ctk.CTkFrame(self.top)
+        controls.pack(fill="x", padx=10, pady=10)
+        self.enabled = ctk.BooleanVar(value=metrics.enabled)
+        ctk.CTkCheckBox(controls, text="Collect timings", variable=self.enabled,
+                        command=self.toggle).pack(side="left", padx=5)
+        ctk.CTkLabel(controls, text="Slow query (ms)").pack(side="left", padx=(15, 5))
+        self.threshold = ctk.StringVar(value=f"{metrics.slow_query_ms:g}")
+        ctk.CTkEntry(controls, textvariable=self.threshold, width=70).pack(side="left")
+        ctk.CTkButton(controls, text="Apply", command=self.applyThreshold, width=70).pack(side="left", padx=5)
+        ctk.CTkButton(controls, text="Dump to File", command=self.dump, width=110).pack(side="right", padx=5)
+        ctk.CTkButton(controls, text="Reset", command=self.reset, width=70).pack(side="right", padx=5)
+
+        columns = ["Metric", "Count", "Mean", "p50", "p95", "p99", "Max"]
+        self.timings = ttk.Treeview(self.top, columns=columns, show="headings", height=14)
+        for col in columns:
+            self.timings.column(col, anchor="w" if col == "Metric" else "e", width=300 if col == "Metric" else 85)
+            self.timings.heading(col, text=col + ("" if col in ("Metric", "Count") else " (ms)"),
+                                 anchor="w" if col == "Metric" else "e")
+        self.timings.pack(fill="both", expand=True, padx=10)
+
+        ctk.CTkLabel(self.top, text="Slow Queries").pack(anchor="w", padx=10, pady=(10, 0))
+        columns = ["When", "Duration (ms)", "Rows", "SQL"]
+        self.slow = ttk.Treeview(self.top, columns=columns, show="headings", height=6)
+        for col, width in zip(columns, (130, 100, 60, 560)):
+            self.slow.column(col, anchor="w", width=width)
+            self.slow.heading(col, text=col, anchor="w")
+        self.slow.pack(fill="x", padx=10, pady=(0, 10))
+
+        self.refresh()
+
+    def refresh(self):
+        if not self.top.winfo_exists():
+            return
+        snapshot = metrics.snapshot()
+        rows = [(name, f"{t['count']:,}", f"{t['mean_ms']:.2f}", f"{t['p50_ms']:.2f}", f"{t['p95_ms']:.2f}",
+                 f"{t['p99_ms']:.2f}", f"{t['max_ms']:.2f}") for name, t in snapshot["timings"].items()]
+        rows += [(name, f"{count:,}", "", "", "", "", "") for name, count in snapshot["counters"].items()]
+        self.fill(self.timings, rows)
+        self.fill(self.slow, [(q["ts"], f"{q['duration_ms']:.1f}", q["rows"], q["sql"])
+                              for q in reversed(snapshot["slow_queries"])])
+        self.top.after(1000, self.refresh)
+
+    @staticmethod
+    def fill(tree, rows):
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        for row in rows:
+            tree.insert("", "end", values=row)
+
+    def toggle(self):
+        metrics.enabled = self.enabled.get()
+
+    def applyThreshold(self):
+        try:
+            threshold = float(self.threshold.get())
+        except ValueError:
+            threshold = -1
+        if threshold < 0:
+            messagebox.showerror("Error", "The slow query threshold must be a number of milliseconds.", parent=self.top)
+            return
+        metrics.slow_query_ms = threshold
+        self.worker.submit(lambda repository: repository.db.set_setting("slow_query_ms", threshold))
+
+    def reset(self):
+        metrics.reset()
+
+    def dump(self):
+        file_path = filedialog.asksaveasfilename(
+            parent=self.top,
+            defaultextension=".json",
+            initialfile=f"grocerify_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")],
+            title="Dump Diagnostics"
+        )
+        if file_path:
+            try:
+                metrics.dump(file_path)
+            except OSError as e:
+                messagebox.showerror("Error", f"Could not write the file: {str(e)}", parent=self.top)
 
-# Configure logging
-logging.basicConfig(
-    filename='log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 
 class InventoryManager:
-    def __init__(self, username, role):
-        # Initialize main window
-        self.window = ctk.CTk()
-        self.window.title(f"Grocerify - Welcome {username}")
-        self.window.geometry("1000x800")
-        self.window.wm_iconbitmap("grocerify_logo.ico")
-        
+    # One screen per role, built once by the app shell and reused by every
+    # login with that role (see activate)
+    def __init__(self, shell, username, role):
+        self.shell = shell
+        self.window = shell.root
+
         self.username = username
         self.role = role
+        self.capabilities = capabilities_for(role)
         
-        # Database setup
-        self.db = Database()
+        # Database setup; every query runs on the worker thread
+        self.worker = DatabaseWorker(lambda: InventoryRepository(Database()))
 
         # Variables for entry fields
         self.placeholderArray = [ctk.StringVar() for _ in range(5)]
+
+        # Category names last read from the database, as shown in the option menus
+        self.categories = []
         
         self.setup_gui()
 
     def setup_gui(self):
-        # Main container
+        # Main container; the shell puts it on screen
         self.main_container = ctk.CTkFrame(self.window)
-        self.main_container.pack(fill="both", expand=True, padx=20, pady=20)
         
         # Title
         title = ctk.CTkLabel(self.main_container, 
@@ -51,19 +325,44 @@ class InventoryManager:
         logout_button = ctk.CTkButton(self.main_container, text="Logout", command=self.logout, fg_color="red", width=120, height=32)
         logout_button.pack(pady=10, anchor="ne", padx=20)
 
-        # Create frames
-        self.create_entry_frame()
+        # Create frames; only roles that can edit get the entry form
+        if "edit" in self.capabilities:
+            self.create_entry_frame()
         self.create_button_frame()
+        self.create_search_frame()
+        self.create_low_stock_frame()
         self.create_table_frame()
 
+    def activate(self, username):
+        # Starts a session on this screen: forget what the previous user typed,
+        # filtered and sorted, then load fresh data
+        self.username = username
+        self.worker.submit(lambda repository: setattr(repository, "username", username))
+
+        self.clearFields()
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+            self.search_job = None
+        self.search_entry.delete(0, "end")
+        self.category_filter.set(ALL_CATEGORIES)
+        self.active_search = ""
+        self.active_category = None
+        self.sort_column = "item_id"
+        self.sort_descending = False
+        for col in self.tree["columns"]:
+            self.tree.heading(col, text=col)
+
+        self.shell.show(self.main_container, f"Grocerify - Welcome {username}", "1000x800", padding=20)
+        self.loadCategories()
+        self.refreshTable()
+        self.refreshLowStock()
+
     def logout(self):
         if messagebox.askyesno("Confirm Logout", "Are you sure you want to logout?"):
-            # Close the current window
-            logging.info(f"Admin '{self.username}' logged out successfully.")
-            self.window.destroy()
-            # Relaunch the login system
-            login_system = LoginSystem()
-            login_system.run()
+            logging.info("%s '%s' logged out successfully.", self.role.capitalize(), self.username,
+                         extra={"event": "logout", "user": self.username})
+            # Back to the login screen; this screen stays built for the next login
+            self.shell.logout()
 
     def create_entry_frame(self):
         entry_frame = ctk.CTkFrame(self.main_container)
@@ -78,7 +377,7 @@ class InventoryManager:
             
             if label == "Category":
                 entry = ctk.CTkOptionMenu(entry_frame,
-                                        values=["Meat", "Vegetables", "Fruits", "Dairy Products","Beverages"], 
+                                        values=self.categories,
                                         variable=self.placeholderArray[i],
                                         width=300)
             else:
@@ -97,23 +396,40 @@ class InventoryManager:
         button_frame = ctk.CTkFrame(self.main_container)
         button_frame.pack(fill="x", padx=20, pady=10)
         
-        # Create buttons with consistent styling
-        buttons = [
-            ("Save", self.saveData),
-            ("Update", self.updateData),
-            ("Delete", self.deleteData),
-            ("Select", self.selectData),
-            ("Clear", self.clearFields),
-            ("Export", self.exportToExcel)
-        ]
+        # Create buttons with consistent styling, one row per group so the
+        # admin's full set still fits the default window width
+        edit_buttons = []
+        if "edit" in self.capabilities:
+            edit_buttons = [
+                ("Save", self.saveData),
+                ("Update", self.updateData),
+                ("Delete", self.deleteData),
+                ("Select", self.selectData),
+                ("Clear", self.clearFields),
+                ("Import", self.importFromCsv),
+            ]
+        report_buttons = []
+        if "export" in self.capabilities:
+            report_buttons.append(("Export", self.exportToExcel))
+        if "audit" in self.capabilities:
+            report_buttons.append(("History", self.showHistory))
+        if "reports" in self.capabilities:
+            report_buttons.append(("Dashboard", self.showDashboard))
+        if "diagnostics" in self.capabilities:
+            report_buttons.append(("Diagnostics", self.showDiagnostics))
         
-        for text, command in buttons:
-            btn = ctk.CTkButton(button_frame,
-                               text=text,
-                               command=command,
-                               width=120,
-                               height=32)
-            btn.pack(side="left", padx=5, pady=5)
+        for buttons in (edit_buttons, report_buttons):
+            if not buttons:
+                continue
+            row = ctk.CTkFrame(button_frame, fg_color="transparent")
+            row.pack(fill="x")
+            for text, command in buttons:
+                btn = ctk.CTkButton(row,
+                                   text=text,
+                                   command=command,
+                                   width=120,
+                                   height=32)
+                btn.pack(side="left", padx=5, pady=5)
 
     def create_table_frame(self):
         # Create a frame specifically for the table
@@ -136,14 +452,16 @@ class InventoryManager:
         # Configure columns
         for col in self.tree["columns"]:
             self.tree.column(col, anchor="w", width=120)
-            self.tree.heading(col, text=col, anchor="w")
+            self.tree.heading(col, text=col, anchor="w", command=lambda c=col: self.sortBy(c))
         
         # Add scrollbars
         y_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
         x_scrollbar = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.tree.xview)
         
-        # Configure the treeview to use scrollbars
-        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
+        # Configure the treeview to use scrollbars; the paged table drives the vertical one
+        self.tree.configure(xscrollcommand=x_scrollbar.set)
+        self.table = PagedTable(self.tree, y_scrollbar, self.fetchPage,
+                                on_error=self.showLoadError, key_for=page_key)
         
         # Grid layout for treeview and scrollbars
         self.tree.grid(row=0, column=0, sticky="nsew")
@@ -153,16 +471,201 @@ class InventoryManager:
         # Configure grid weights
         tree_frame.grid_rowconfigure(0, weight=1)
         tree_frame.grid_columnconfigure(0, weight=1)
-        
+
+    def create_low_stock_frame(self):
+        # Side panel listing the items at or below their reorder threshold
+        low_stock_frame = ctk.CTkFrame(self.main_container)
+        low_stock_frame.pack(side="right", fill="y", padx=(0, 20), pady=10)
+
+        self.low_stock_label = ctk.CTkLabel(low_stock_frame, text="Low Stock",
+                                            font=ctk.CTkFont(size=14, weight="bold"))
+        self.low_stock_label.pack(pady=(5, 0))
+
+        tree_frame = ttk.Frame(low_stock_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+        self.low_stock_tree = ttk.Treeview(tree_frame, columns=["Item Id", "Name", "Qty", "Reorder At"],
+                                           show="headings", height=10)
+        for col, width in (("Item Id", 90), ("Name", 110), ("Qty", 50), ("Reorder At", 75)):
+            self.low_stock_tree.column(col, anchor="w", width=width)
+            self.low_stock_tree.heading(col, text=col, anchor="w")
+        low_stock_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.low_stock_tree.yview)
+        self.low_stock_tree.configure(yscrollcommand=low_stock_scrollbar.set)
+        self.low_stock_tree.pack(side="left", fill="both", expand=True)
+        low_stock_scrollbar.pack(side="right", fill="y")
+
+        if "edit" in self.capabilities:
+            # Reorder thresholds for the selected item or a whole category;
+            # an empty value removes the threshold
+            threshold_frame = ctk.CTkFrame(low_stock_frame, fg_color="transparent")
+            threshold_frame.pack(fill="x", padx=5, pady=5)
+            self.threshold_value = ctk.StringVar()
+            ctk.CTkLabel(threshold_frame, text="Reorder at").grid(row=0, column=0, padx=5, pady=3, sticky="e")
+            ctk.CTkEntry(threshold_frame, textvariable=self.threshold_value, width=80).grid(row=0, column=1, padx=5, pady=3, sticky="w")
+            self.threshold_category = ctk.StringVar()
+            self.threshold_category_menu = ctk.CTkOptionMenu(threshold_frame, values=self.categories,
+                                                             variable=self.threshold_category, width=150)
+            self.threshold_category_menu.grid(row=1, column=0, columnspan=2, padx=5, pady=3)
+            ctk.CTkButton(threshold_frame, text="Set for Selected Item", command=self.setItemThreshold,
+                          width=150).grid(row=2, column=0, columnspan=2, padx=5, pady=3)
+            ctk.CTkButton(threshold_frame, text="Set for Category", command=self.setCategoryThreshold,
+                          width=150).grid(row=3, column=0, columnspan=2, padx=5, pady=3)
+
+    def refreshLowStock(self):
+        # Called after every change to quantities or thresholds; only reads the alert table
+        def loaded(rows):
+            children = self.low_stock_tree.get_children()
+            if children:
+                self.low_stock_tree.delete(*children)
+            for item_id, name, category, quantity, threshold, since in rows:
+                self.low_stock_tree.insert("", "end", values=(item_id, name, quantity, threshold))
+            self.low_stock_label.configure(text=f"Low Stock ({len(rows)})" if rows else "Low Stock")
+
+        deliver(self.window, self.worker.submit(InventoryRepository.fetch_low_stock), loaded, self.showLoadError)
+
+    def readThreshold(self):
+        # Returns (ok, threshold); an empty field means "no threshold"
+        value = self.threshold_value.get().strip()
+        if not value:
+            return True, None
+        try:
+            threshold = int(value)
+        except ValueError:
+            threshold = -1
+        if threshold < 0:
+            messagebox.showerror("Error", "The reorder threshold must be a whole number of at least 0.")
+            return False, None
+        return True, threshold
+
+    def setItemThreshold(self):
+        selected_item = self.tree.selection()
+        if not selected_item:
+            messagebox.showerror("Error", "Please select an item!")
+            return
+        ok, threshold = self.readThreshold()
+        if not ok:
+            return
+        item_id = self.table.item_id_for(selected_item[0])
+        self.saveThreshold(InventoryRepository.set_item_threshold, item_id, threshold)
+
+    def setCategoryThreshold(self):
+        category = self.threshold_category.get()
+        if not category:
+            messagebox.showerror("Error", "Please select a category!")
+            return
+        ok, threshold = self.readThreshold()
+        if ok:
+            self.saveThreshold(InventoryRepository.set_category_threshold, category, threshold)
+
+    def saveThreshold(self, setter, key, threshold):
+        def saved(_):
+            logging.info("Admin '%s' set the reorder threshold of '%s' to %s", self.username, key, threshold,
+                         extra={"event": "threshold_set", "user": self.username})
+            self.refreshLowStock()
+
+        def failed(error):
+            messagebox.showerror("Error", f"Failed to save the threshold: {str(error)}")
+
+        deliver(self.window, self.worker.submit(setter, key, threshold), saved, failed)
+
+    def create_search_frame(self):
+        search_frame = ctk.CTkFrame(self.main_container)
+        search_frame.pack(fill="x", padx=20, pady=(10, 0))
+
+        # Filters the table by what's typed (debounced) and by category
+        self.search_entry = ctk.CTkEntry(search_frame,
+                                         placeholder_text="Search name, item ID or category",
+                                         width=400)
+        self.search_entry.bind("<KeyRelease>", lambda event: self.scheduleSearch())
+        self.search_entry.pack(side="left", padx=5, pady=5)
+
+        self.category_filter = ctk.StringVar(value=ALL_CATEGORIES)
+        self.category_filter_menu = ctk.CTkOptionMenu(search_frame,
+                                                      values=[ALL_CATEGORIES] + self.categories,
+                                                      variable=self.category_filter,
+                                                      command=lambda _: self.applyFilter(),
+                                                      width=180)
+        self.category_filter_menu.pack(side="left", padx=5, pady=5)
+
+        # Filters currently applied to the table
+        self.active_search = ""
+        self.active_category = None
+        self.search_job = None
+
+        # Sort chosen from the table headings; kept across refreshes
+        self.sort_column = "item_id"
+        self.sort_descending = False
+
+    def loadCategories(self):
+        # Read once per session and after imports, which may bring new
+        # categories; the query itself is served from the read cache
+        deliver(self.window, self.worker.submit(InventoryRepository.fetch_categories),
+                self.showCategories, self.showLoadError)
+
+    def showCategories(self, categories):
+        if categories == self.categories:
+            return
+        self.categories = categories
+        self.category_filter_menu.configure(values=[ALL_CATEGORIES] + categories)
+        if "edit" in self.capabilities:
+            self.entries[4].configure(values=categories)
+            self.threshold_category_menu.configure(values=categories)
+            if self.threshold_category.get() not in categories:
+                self.threshold_category.set(categories[0] if categories else "")
+
+    def scheduleSearch(self):
+        # Wait until the user stops typing before querying
+        if self.search_job is not None:
+            self.window.after_cancel(self.search_job)
+        self.search_job = self.window.after(300, self.applyFilter)
+
+    def applyFilter(self):
+        self.search_job = None
+        search = self.search_entry.get().strip()
+        category = self.category_filter.get()
+        category = None if category == ALL_CATEGORIES else category
+        if (search, category) == (self.active_search, self.active_category):
+            return  # e.g. only the cursor moved
+        self.active_search = search
+        self.active_category = category
         self.refreshTable()
 
+    def sortBy(self, heading):
+        # Clicking the sorted heading again flips the direction
+        column = COLUMN_SORTS[heading]
+        if column == self.sort_column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+
+        for col in self.tree["columns"]:
+            arrow = ""
+            if COLUMN_SORTS[col] == self.sort_column:
+                arrow = " \u25bc" if self.sort_descending else " \u25b2"
+            self.tree.heading(col, text=col + arrow)
+        self.refreshTable()
+
+    def isDefaultView(self):
+        # Unfiltered and in item ID order, where new rows can be placed locally
+        return (not self.active_search and not self.active_category
+                and self.sort_column == "item_id" and not self.sort_descending)
+
+    def fetchPage(self, **kwargs):
+        return self.worker.submit(InventoryRepository.fetch_page,
+                                  search=self.active_search,
+                                  category=self.active_category,
+                                  sort=self.sort_column,
+                                  descending=self.sort_descending,
+                                  **kwargs)
+
     def refreshTable(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        self.db.cursor.execute("SELECT * FROM inventory")
-        for row in self.db.cursor.fetchall():
-            self.tree.insert("", "end", values=row)
+        # Only the first page is materialized, the rest loads as the user scrolls
+        self.table.reset()
+
+    def showLoadError(self, error):
+        logging.error("Failed to load inventory for user '%s': %s", self.username, error,
+                      extra={"event": "load_failed", "user": self.username})
+        messagebox.showerror("Error", f"Failed to load inventory: {str(error)}")
 
     def saveData(self):
         item_id = self.placeholderArray[0].get()
@@ -177,25 +680,40 @@ class InventoryManager:
             return
 
         try:
-            self.db.cursor.execute("""
-                INSERT INTO inventory VALUES (?, ?, ?, ?, ?, ?)
-            """, (item_id, name, float(price), int(quantity), category, date_added))
-            self.db.conn.commit()
-            self.refreshTable()
-            self.clearFields()
-            logging.info(f"Admin '{self.username}' saved new ID '{item_id}: '{name}, {price}, {quantity}, {category}'")
-            messagebox.showinfo("Success", "Item saved successfully!")
-        except sqlite3.IntegrityError:
-            messagebox.showerror("Error", "Item ID already exists!")
+            row = (item_id, name, float(price), int(quantity), category, date_added)
         except ValueError:
             messagebox.showerror("Error", "Invalid price or quantity format!")
+            return
+
+        def saved(_):
+            # A filtered or sorted view can't tell where the new row goes; reload its first page
+            if not self.isDefaultView():
+                self.refreshTable()
+            else:
+                self.table.insert_row(row)
+            self.refreshLowStock()
+            self.clearFields()
+            logging.info("Admin '%s' saved new ID '%s'", self.username, item_id,
+                         extra={"event": "item_saved", "user": self.username, "item_id": item_id,
+                                "duration_ms": elapsed_ms(started)})
+            messagebox.showinfo("Success", "Item saved successfully!")
+
+        def failed(error):
+            if isinstance(error, sqlite3.IntegrityError):
+                messagebox.showerror("Error", "Item ID already exists!")
+            else:
+                messagebox.showerror("Error", f"Failed to save item: {str(error)}")
+
+        started = time.perf_counter()
+        deliver(self.window, self.worker.submit(InventoryRepository.insert_item, row), saved, failed)
 
     def updateData(self):
         selected_item = self.tree.selection()
         if not selected_item:
             messagebox.showerror("Error", "Please select an item to update!")
             return
-        original_item_id = self.tree.item(selected_item[0])['values'][0]
+        original_item_id = self.table.item_id_for(selected_item[0])
+        date_added = self.tree.item(selected_item[0])['values'][5]
 
         new_item_id = self.placeholderArray[0].get()
         name = self.placeholderArray[1].get()
@@ -203,24 +721,30 @@ class InventoryManager:
         quantity = self.placeholderArray[3].get()
         category = self.placeholderArray[4].get()
 
+        if str(new_item_id) != str(original_item_id):
+            messagebox.showerror("Error", "You cannot edit the item ID.")
+            return
         try:
-            if str(new_item_id) != str(original_item_id):
-                messagebox.showerror("Error", "You cannot edit the item ID.")
-                return
-            self.db.cursor.execute("""
-                UPDATE inventory 
-                SET name=?, price=?, quantity=?, category=?
-                WHERE item_id=?
-            """, (name, float(price), int(quantity), category, original_item_id))
-            self.db.conn.commit()
-            self.refreshTable()
-            self.clearFields()
-            logging.info(f"Admin '{self.username}' updated ID '{new_item_id} to '{name}, {price}, {quantity}, {category}'")
-            messagebox.showinfo("Success", "Item updated successfully!")
+            row = (original_item_id, name, float(price), int(quantity), category, date_added)
         except ValueError:
             messagebox.showerror("Error", "Invalid price or quantity format!")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to update item: {str(e)}")
+            return
+
+        def updated(_):
+            self.table.update_row(row)
+            self.refreshLowStock()
+            self.clearFields()
+            logging.info("Admin '%s' updated ID '%s'", self.username, original_item_id,
+                         extra={"event": "item_updated", "user": self.username, "item_id": original_item_id,
+                                "duration_ms": elapsed_ms(started)})
+            messagebox.showinfo("Success", "Item updated successfully!")
+
+        def failed(error):
+            messagebox.showerror("Error", f"Failed to update item: {str(error)}")
+
+        started = time.perf_counter()
+        future = self.worker.submit(InventoryRepository.update_item, original_item_id, *row[1:5])
+        deliver(self.window, future, updated, failed)
 
     def deleteData(self):
         selected_item = self.tree.selection()
@@ -229,13 +753,22 @@ class InventoryManager:
             return
 
         if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this item?"):
-            item_id = self.tree.item(selected_item[0])['values'][0]
-            self.db.cursor.execute("DELETE FROM inventory WHERE item_id=?", (item_id,))
-            self.db.conn.commit()
-            self.refreshTable()
-            self.clearFields()
-            logging.info(f"Admin '{self.username}' deleted item with ID '{item_id}'")
-            messagebox.showinfo("Success", "Item deleted successfully!")
+            item_id = self.table.item_id_for(selected_item[0])
+
+            def deleted(_):
+                self.table.delete_row(item_id)
+                self.refreshLowStock()
+                self.clearFields()
+                logging.info("Admin '%s' deleted item with ID '%s'", self.username, item_id,
+                             extra={"event": "item_deleted", "user": self.username, "item_id": item_id,
+                                    "duration_ms": elapsed_ms(started)})
+                messagebox.showinfo("Success", "Item deleted successfully!")
+
+            def failed(error):
+                messagebox.showerror("Error", f"Failed to delete item: {str(error)}")
+
+            started = time.perf_counter()
+            deliver(self.window, self.worker.submit(InventoryRepository.delete_item, item_id), deleted, failed)
 
     def selectData(self):
         selected_item = self.tree.selection()
@@ -252,317 +785,136 @@ class InventoryManager:
             var.set("")
 
     def generateId(self):
-        self.placeholderArray[0].set(f"ITEM-{random.randint(1000, 9999)}")
-
-    def exportToExcel(self):
-        try:
-            # Get current timestamp for filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_filename = f"inventory_export_{timestamp}.csv"
-            
-            # Open file dialog for saving
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                initialfile=default_filename,
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export Inventory Data"
-            )
-            
-            if not file_path:  # If user cancels the dialog
-                return
-            
-            # Fetch all data from database with date_added
-            self.db.cursor.execute("""
-                SELECT 
-                    item_id,
-                    name,
-                    price,
-                    quantity,
-                    category,
-                    date_added
-                FROM inventory
-                ORDER BY date_added DESC
-            """)
-            rows = self.db.cursor.fetchall()
-            
-            # Write to CSV with proper formatting
-            with open(file_path, "w", newline="", encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                # Write headers
-                writer.writerow([
-                    "Item ID",
-                    "Name",
-                    "Price",
-                    "Quantity",
-                    "Category",
-                    "Date Added"
-                ])
-                
-                # Write data rows with formatted values
-                for row in rows:
-                    item_id, name, price, quantity, category, date_added = row
-                    
-                    # Format price to 2 decimal places
-                    formatted_price = f"{float(price):.2f}"
-                    
-                    # Convert date string to datetime and format it
-                    try:
-                        date_obj = datetime.strptime(date_added, "%Y-%m-%d %H:%M:%S")
-                        formatted_date = date_obj.strftime("%Y-%m-%d %I:%M:%S %p")
-                    except ValueError:
-                        formatted_date = date_added  # Keep original if parsing fails
-                    
-                    writer.writerow([
-                        item_id,
-                        name,
-                        formatted_price,
-                        quantity,
-                        category,
-                        formatted_date
-                    ])
-            
-            # Get file size for the success message
-            file_size = os.path.getsize(file_path) / 1024  # Convert to KB
-            
-            logging.info(f"User '{self.username}' exported inventory data to '{file_path}'")
-            messagebox.showinfo(
-                "Export Successful",
-                f"Data exported successfully!\n\n"
-                f"Location: {file_path}\n"
-                f"Items exported: {len(rows)}\n"
-                f"File size: {file_size:.1f} KB\n\n"
-            )
-            
-            # Ask if user wants to open the exported file
-            if messagebox.askyesno("Open File", "Would you like to open the exported file?"):
-                os.startfile(file_path)
-                
-        except PermissionError:
-            logging.error(f"Permission error while user '{self.username}' tried to export data")
-            messagebox.showerror(
-                "Export Error",
-                "Could not save the file. Please check if the file is open in another program."
-            )
-        except Exception as e:
-            logging.error(f"An error occurred while user '{self.username}' tried to export data: {str(e)}")
-            messagebox.showerror(
-                "Export Error",
-                f"An error occurred while exporting: {str(e)}"
-            )
-    
-    def run(self):
-        self.window.mainloop()
-
-class InventoryManagerUser:
-    def __init__(self, username, role):
-        # Initialize main window
-        self.window = ctk.CTk()
-        self.window.title(f"Grocerify - Welcome {username}")
-        self.window.geometry("1000x800")
-        self.window.wm_iconbitmap("grocerify_logo.ico")
-        
-        self.username = username
-        self.role = role
-        
-        # Database setup
-        self.db = Database()
+        # IDs come from a sequence in the database, so they never collide
+        def failed(error):
+            messagebox.showerror("Error", f"Failed to generate an item ID: {str(error)}")
 
-        # Variables for entry fields
-        self.placeholderArray = [ctk.StringVar() for _ in range(5)]
-        
-        self.setup_gui()
+        future = self.worker.submit(InventoryRepository.allocate_item_id)
+        deliver(self.window, future, self.placeholderArray[0].set, failed)
 
-    def setup_gui(self):
-        # Main container
-        self.main_container = ctk.CTkFrame(self.window)
-        self.main_container.pack(fill="both", expand=True, padx=20, pady=20)
-        
-        # Title
-        title = ctk.CTkLabel(self.main_container, 
-                            text="Grocerify",
-                            font=ctk.CTkFont(size=24, weight="bold"))
-        title.pack(pady=10)
-        
-        #Logout Button
-        logout_button = ctk.CTkButton(self.main_container, text="Logout", command=self.logout, fg_color="red", width=120, height=32)
-        logout_button.pack(pady=10, anchor="ne", padx=20)
+    def showHistory(self):
+        # History of the selected item, or of the whole inventory when nothing is selected
+        selected_item = self.tree.selection()
+        item_id = self.table.item_id_for(selected_item[0]) if selected_item else None
+        HistoryWindow(self.window, self.worker, item_id)
 
-        # Create frames
-        self.create_button_frame()
-        self.create_table_frame()
+    def showDashboard(self):
+        DashboardWindow(self.window, self.worker)
 
-    def logout(self):
-        if messagebox.askyesno("Confirm Logout", "Are you sure you want to logout?"):
-            # Close the current window
-            logging.info(f"User '{self.username}' logged out successfully.")
-            self.window.destroy()
-            # Relaunch the login system
-            login_system = LoginSystem()
-            login_system.run()
+    def showDiagnostics(self):
+        DiagnosticsWindow(self.window, self.worker)
 
-    def create_button_frame(self):
-        button_frame = ctk.CTkFrame(self.main_container)
-        button_frame.pack(fill="x", padx=20, pady=10)
+    def exportToExcel(self):
+        # Get current timestamp for filename
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        default_filename = f"inventory_export_{timestamp}.csv"
         
-        # Create buttons with consistent styling
-        buttons = [
-            ("Export", self.exportToExcel)
-        ]
+        # Open file dialog for saving
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            initialfile=default_filename,
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Export Inventory Data"
+        )
         
-        for text, command in buttons:
-            btn = ctk.CTkButton(button_frame,
-                               text=text,
-                               command=command,
-                               width=120,
-                               height=32)
-            btn.pack(side="left", padx=5, pady=5)
-
-    def create_table_frame(self):
-        # Create a frame specifically for the table
-        table_frame = ctk.CTkFrame(self.main_container)
-        table_frame.pack(fill="both", expand=True, padx=20, pady=10)
-
-        # Create a nested tk.Frame for the Treeview
-        tree_frame = ttk.Frame(table_frame)
-        tree_frame.pack(fill="both", expand=True)
-        
-        # Create Treeview with modern styling
-        self.tree = ttk.Treeview(tree_frame, show='headings', height=20)
-        self.tree["columns"] = ["Item Id", "Name", "Price", "Quantity", "Category", "Date"]
+        if not file_path:  # If user cancels the dialog
+            return
 
-        # Configure the Treeview style
-        style = ttk.Style()
-        style.configure("Treeview", rowheight=25)
-        style.configure("Treeview.Heading", font=('Arial', 10, 'bold'))
-        
-        # Configure columns
-        for col in self.tree["columns"]:
-            self.tree.column(col, anchor="w", width=120)
-            self.tree.heading(col, text=col, anchor="w")
-        
-        # Add scrollbars
-        y_scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-        x_scrollbar = ttk.Scrollbar(tree_frame, orient="horizontal", command=self.tree.xview)
-        
-        # Configure the treeview to use scrollbars
-        self.tree.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-        
-        # Grid layout for treeview and scrollbars
-        self.tree.grid(row=0, column=0, sticky="nsew")
-        y_scrollbar.grid(row=0, column=1, sticky="ns")
-        x_scrollbar.grid(row=1, column=0, sticky="ew")
-        
-        # Configure grid weights
-        tree_frame.grid_rowconfigure(0, weight=1)
-        tree_frame.grid_columnconfigure(0, weight=1)
-        
-        self.refreshTable()
+        dialog = ProgressDialog(self.window, "Exporting", "Exported {done:,} of {total:,} items")
 
-    def refreshTable(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        self.db.cursor.execute("SELECT * FROM inventory")
-        for row in self.db.cursor.fetchall():
-            self.tree.insert("", "end", values=row)
+        def exported(row_count):
+            dialog.close()
 
-    def exportToExcel(self):
-        try:
-            # Get current timestamp for filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            default_filename = f"inventory_export_{timestamp}.csv"
-            
-            # Open file dialog for saving
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".csv",
-                initialfile=default_filename,
-                filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-                title="Export Inventory Data"
-            )
-            
-            if not file_path:  # If user cancels the dialog
-                return
-            
-            # Fetch all data from database with date_added
-            self.db.cursor.execute("""
-                SELECT 
-                    item_id,
-                    name,
-                    price,
-                    quantity,
-                    category,
-                    date_added
-                FROM inventory
-                ORDER BY date_added DESC
-            """)
-            rows = self.db.cursor.fetchall()
-            
-            # Write to CSV with proper formatting
-            with open(file_path, "w", newline="", encoding='utf-8') as file:
-                writer = csv.writer(file)
-                
-                # Write headers
-                writer.writerow([
-                    "Item ID",
-                    "Name",
-                    "Price",
-                    "Quantity",
-                    "Category",
-                    "Date Added"
-                ])
-                
-                # Write data rows with formatted values
-                for row in rows:
-                    item_id, name, price, quantity, category, date_added = row
-                    
-                    # Format price to 2 decimal places
-                    formatted_price = f"{float(price):.2f}"
-                    
-                    # Convert date string to datetime and format it
-                    try:
-                        date_obj = datetime.strptime(date_added, "%Y-%m-%d %H:%M:%S")
-                        formatted_date = date_obj.strftime("%Y-%m-%d %I:%M:%S %p")
-                    except ValueError:
-                        formatted_date = date_added  # Keep original if parsing fails
-                    
-                    writer.writerow([
-                        item_id,
-                        name,
-                        formatted_price,
-                        quantity,
-                        category,
-                        formatted_date
-                    ])
-            
             # Get file size for the success message
             file_size = os.path.getsize(file_path) / 1024  # Convert to KB
-            logging.info(f"User '{self.username}' exported inventory data to '{file_path}'")
-
+            
+            duration = elapsed_ms(started)
+            metrics.record("export", duration)
+            logging.info("User '%s' exported %s items to '%s'", self.username, row_count, file_path,
+                         extra={"event": "export", "user": self.username, "duration_ms": duration})
             messagebox.showinfo(
                 "Export Successful",
                 f"Data exported successfully!\n\n"
                 f"Location: {file_path}\n"
-                f"Items exported: {len(rows)}\n"
+                f"Items exported: {row_count}\n"
                 f"File size: {file_size:.1f} KB\n\n"
             )
             
             # Ask if user wants to open the exported file
             if messagebox.askyesno("Open File", "Would you like to open the exported file?"):
                 os.startfile(file_path)
-                
-        except PermissionError:
-            logging.error(f"Permission error while user '{self.username}' tried to export data")
-            messagebox.showerror(
-                "Export Error",
-                "Could not save the file. Please check if the file is open in another program."
-            )
-        except Exception as e:
-            logging.error(f"An error occurred while user '{self.username}' tried to export data: {str(e)}")
-            messagebox.showerror(
-                "Export Error",
-                f"An error occurred while exporting: {str(e)}"
-            )
 
-    def run(self):
-        self.window.mainloop()
+        def failed(error):
+            dialog.close()
+            if isinstance(error, ExportCancelled):
+                logging.info("User '%s' cancelled the export to '%s'", self.username, file_path,
+                             extra={"event": "export_cancelled", "user": self.username})
+                messagebox.showinfo("Export Cancelled", "The export was cancelled.")
+            elif isinstance(error, PermissionError):
+                logging.error("Permission error while user '%s' tried to export data", self.username,
+                              extra={"event": "export_failed", "user": self.username})
+                messagebox.showerror(
+                    "Export Error",
+                    "Could not save the file. Please check if the file is open in another program."
+                )
+            else:
+                logging.error("An error occurred while user '%s' tried to export data: %s", self.username, error,
+                              extra={"event": "export_failed", "user": self.username})
+                messagebox.showerror(
+                    "Export Error",
+                    f"An error occurred while exporting: {str(error)}"
+                )
+
+        # Rows are streamed to the file in batches on the database worker
+        started = time.perf_counter()
+        future = self.worker.submit(InventoryRepository.export_csv, file_path, dialog.report, dialog.cancel_event)
+        dialog.watch(future)
+        deliver(self.window, future, exported, failed)
+    
+    def importFromCsv(self):
+        file_path = filedialog.askopenfilename(
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+            title="Import Inventory Data"
+        )
+
+        if not file_path:  # If user cancels the dialog
+            return
+
+        dialog = ProgressDialog(self.window, "Importing", "Processed {done:,} of {total:,} rows")
+
+        def imported(result):
+            dialog.close()
+            # One refresh for the whole import instead of one per row
+            self.loadCategories()
+            self.refreshTable()
+            self.refreshLowStock()
+            duration = elapsed_ms(started)
+            metrics.record("import", duration)
+            logging.info("Admin '%s' imported %s items from '%s' (%s rejected)",
+                         self.username, result.imported, file_path, result.rejected,
+                         extra={"event": "import", "user": self.username, "duration_ms": duration})
+
+            message = f"Items imported: {result.imported}\nRows rejected: {result.rejected}"
+            if result.rejected_path:
+                message += f"\n\nRejected rows were saved to:\n{result.rejected_path}"
+            messagebox.showinfo("Import Finished", message)
+
+        def failed(error):
+            dialog.close()
+            self.loadCategories()
+            self.refreshTable()
+            self.refreshLowStock()
+            if isinstance(error, ImportCancelled):
+                logging.info("Admin '%s' cancelled the import from '%s'", self.username, file_path,
+                             extra={"event": "import_cancelled", "user": self.username})
+                messagebox.showinfo("Import Cancelled", "The import was cancelled. Rows imported before cancelling were kept.")
+            else:
+                logging.error("An error occurred while admin '%s' tried to import data: %s", self.username, error,
+                              extra={"event": "import_failed", "user": self.username})
+                messagebox.showerror("Import Error", f"An error occurred while importing: {str(error)}")
+
+        started = time.perf_counter()
+        future = self.worker.submit(InventoryRepository.import_csv, file_path, dialog.report, dialog.cancel_event)
+        dialog.watch(future)
+        deliver(self.window, future, imported, failed)
+
@@ -0,0 +1,328 @@
+# inventory_repository.py
+# The one data layer behind every inventory screen. Admin and user sessions
+# share these queries and the export engine; what a session may do is decided
+# by its role's capabilities, not by separate copies of the code.
+import re
+from contextlib import contextmanager
+from datetime import datetime
+
+from export_service import export_inventory_csv
+from import_service import import_inventory_csv
+from query_cache import inventory_cache
+
+# What each role is allowed to do on the inventory screen
+ROLE_CAPABILITIES = {
+    "admin": {"edit", "export", "audit", "reports", "diagnostics"},
+    "user": {"export", "reports"},
+}
+
+
+def capabilities_for(role):
+    return ROLE_CAPABILITIES.get(role, set())
+
+
+# Columns the table can be sorted by, with the collation the index uses. Ties
+# are broken by item_id so every row has a unique keyset position. Category
+# sorts by name, through the categories table (see SORT_SOURCES).
+SORT_COLUMNS = {
+    "item_id": ("i.item_id", ""),
+    "name": ("i.name", " COLLATE NOCASE"),
+    "price": ("i.price", ""),
+    "quantity": ("i.quantity", ""),
+    "category": ("c.name", ""),
+    "date_added": ("i.date_added", ""),
+}
+
+
+# Tables a sort reads from. Sorting by category walks the categories in name
+# order and each one's items through the (category_id, item_id) index. The
+# index is named because with ANALYZE statistics (a category holds many rows)
+# SQLite prefers building an automatic index and sorting the whole result.
+SORT_SOURCES = {
+    "category": "categories AS c CROSS JOIN inventory AS i INDEXED BY idx_inventory_by_category "
+                "ON i.category_id = c.id",
+}
+
+
+# The six columns of an inventory row as the screens see them, with the
+# category's name in place of its ID
+ITEM_COLUMNS = ("i.item_id, i.name, i.price, i.quantity, "
+                "(SELECT name FROM categories WHERE id = i.category_id), i.date_added")
+
+# A category's ID from its name; a constant subquery, so filters and writes
+# compare integers and the lookup runs once per statement
+CATEGORY_ID = "(SELECT id FROM categories WHERE name = ?)"
+
+
+# Keyset key of a row returned by InventoryRepository.fetch_page: rows of a
+# sorted or searched page carry their key values after the six columns
+def page_key(row):
+    return tuple(row[6:]) if len(row) > 6 else row[0]
+
+
+# Turns what the user typed into an FTS5 prefix query: every word must match
+# the start of a token in the item ID, name or category
+def fts_query(text):
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text or ""))
+
+
+# Generated item IDs are ITEM- plus a zero-padded sequence number, so they
+# sort in allocation order and new rows land at the end of their key range
+ITEM_ID_PREFIX = "ITEM-"
+ITEM_ID_DIGITS = 8
+
+
+# Columns of a stock_movements row as returned by fetch_movements
+MOVEMENT_COLUMNS = (
+    "id", "ts", "username", "action", "item_id",
+    "old_name", "old_price", "old_quantity", "old_category",
+    "new_name", "new_price", "new_quantity", "new_category",
+    "quantity_delta",
+)
+
+
+class InventoryRepository:
+    def __init__(self, db, username=None):
+        # username is recorded as the author of every stock movement
+        self.db = db
+        self.username = username
+
+    # Returns one page of inventory rows using keyset pagination (see
+    # page_key), so any page costs about the same as the first one. Rows are
+    # ordered by sort (a SORT_COLUMNS key) and then item_id; a text search
+    # without a sort comes back in FTS rowid order, which needs no sorting.
+    # Pages are served from the shared read cache until the inventory changes.
+    def fetch_page(self, after=None, before=None, limit=100, search="", category=None,
+                   sort="item_id", descending=False):
+        match = fts_query(search)
+        params = []
+        if match and sort == "item_id" and not descending:
+            sql = f"""
+                SELECT {ITEM_COLUMNS}, f.rowid FROM inventory_fts AS f
+                JOIN inventory AS i ON i.rowid = f.rowid
+                WHERE inventory_fts MATCH ?
+            """
+            params.append(match)
+            keys = [("f.rowid", "")]
+        else:
+            keys = [SORT_COLUMNS[sort]]
+            if sort != "item_id":
+                keys.append(SORT_COLUMNS["item_id"])
+            columns = "".join(f", {column}{collate}" for column, collate in keys) if len(keys) > 1 else ""
+            source = SORT_SOURCES.get(sort, "inventory AS i")
+            sql = f"SELECT {ITEM_COLUMNS}{columns} FROM {source} WHERE 1"
+            if match:
+                # The unary + keeps the planner from driving the query by the
+                # matches' rowids, which would sort every match for each page;
+                # it walks the sort index and checks the matches instead
+                sql += " AND +i.rowid IN (SELECT rowid FROM inventory_fts WHERE inventory_fts MATCH ?)"
+                params.append(match)
+
+        if category:
+            sql += f" AND i.category_id = {CATEGORY_ID}"
+            params.append(category)
+
+        # Going backwards walks the same index in the opposite direction
+        backwards = before is not None
+        key = before if backwards else after
+        reverse = backwards != descending
+        if key is not None:
+            key = key if isinstance(key, tuple) else (key,)
+            left = ", ".join(column for column, collate in keys)
+            right = ", ".join(f"?{collate}" for column, collate in keys)
+            sql += f" AND ({left}) {'<' if reverse else '>'} ({right})"
+            params += key
+
+        direction = " DESC" if reverse else ""
+        sql += " ORDER BY " + ", ".join(f"{column}{collate}{direction}" for column, collate in keys)
+        sql += " LIMIT ?"
+        params.append(limit)
+        return self.read(sql, tuple(params))
+
+    # Re-indexes every item for search, e.g. after the file was vacuumed
+    def rebuild_search_index(self):
+        self.db.cursor.execute("DELETE FROM inventory_fts")
+        self.db.cursor.execute("""
+            INSERT INTO inventory_fts (rowid, item_id, name, category)
+            SELECT rowid, item_id, name, (SELECT name FROM categories WHERE id = category_id) FROM inventory
+        """)
+        self.db.conn.commit()
+        inventory_cache.invalidate()
+
+    # Hands out the next item ID from the id_sequences table. The increment is a
+    # single UPDATE, so processes sharing the file never get the same number.
+    # IDs of the same shape that were typed in or imported move the sequence
+    # past themselves through the id_sequence triggers, so this touches only
+    # the one id_sequences row.
+    def allocate_item_id(self):
+        value = self.db.cursor.execute("""
+            UPDATE id_sequences SET value = value + 1
+            WHERE name = 'item'
+            RETURNING value
+        """).fetchone()[0]
+        self.db.conn.commit()
+        return f"{ITEM_ID_PREFIX}{value:0{ITEM_ID_DIGITS}d}"
+
+    def read(self, sql, params=()):
+        return inventory_cache.fetch(self.db.conn, self.db.db_name, sql, params)
+
+    # Category names in table order, for the option menus
+    def fetch_categories(self):
+        return [name for (name,) in self.read("SELECT name FROM categories ORDER BY id")]
+
+    # Adds a category if it isn't there yet; a new ID is handed out only once
+    def add_category(self, name):
+        with self.write_transaction():
+            self.ensure_category(name)
+
+    def ensure_category(self, name):
+        self.db.cursor.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (name,))
+
+    # Every write below commits together with its stock_movements row, so the
+    # history can't miss a change or record one that was rolled back, and
+    # empties the read cache once it has committed. Rows carry the category
+    # name; a name that isn't in the categories table yet is added to it.
+    def insert_item(self, row):
+        with self.write_transaction():
+            self.ensure_category(row[4])
+            self.db.cursor.execute(f"""
+                INSERT INTO inventory (item_id, name, price, quantity, category_id, date_added)
+                VALUES (?, ?, ?, ?, {CATEGORY_ID}, ?)
+            """, row)
+            self.record_movement("add", row[0], None, row[1:5])
+
+    def update_item(self, item_id, name, price, quantity, category):
+        with self.write_transaction():
+            old = self.current_values(item_id)
+            self.ensure_category(category)
+            self.db.cursor.execute(f"""
+                UPDATE inventory
+                SET name=?, price=?, quantity=?, category_id={CATEGORY_ID}
+                WHERE item_id=?
+            """, (name, price, quantity, category, item_id))
+            if old is not None:
+                self.record_movement("update", item_id, old, (name, price, quantity, category))
+
+    def delete_item(self, item_id):
+        with self.write_transaction():
+            old = self.current_values(item_id)
+            self.db.cursor.execute("DELETE FROM inventory WHERE item_id=?", (item_id,))
+            if old is not None:
+                self.record_movement("delete", item_id, old, None)
+
+    @contextmanager
+    def write_transaction(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so the old values read
+        # for the history are still current when the change is written
+        self.db.cursor.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self.db.conn.commit()
+        except BaseException:
+            self.db.conn.rollback()
+            raise
+        inventory_cache.invalidate()
+
+    def current_values(self, item_id):
+        return self.db.cursor.execute("""
+            SELECT name, price, quantity, (SELECT name FROM categories WHERE id = category_id)
+            FROM inventory WHERE item_id=?
+        """, (item_id,)).fetchone()
+
+    # old and new are (name, price, quantity, category), None for a missing side
+    def record_movement(self, action, item_id, old, new):
+        old = tuple(old) if old is not None else (None,) * 4
+        new = tuple(new) if new is not None else (None,) * 4
+        delta = (new[2] or 0) - (old[2] or 0)
+        self.db.cursor.execute("""
+            INSERT INTO stock_movements (
+                item_id, ts, username, action,
+                old_name, old_price, old_quantity, old_category,
+                new_name, new_price, new_quantity, new_category,
+                quantity_delta
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (item_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), self.username, action) + old + new + (delta,))
+
+    # Pages through the stock movements of one item, or of every item, newest
+    # first. Keyset keys are (ts, id); "after" walks towards older movements.
+    def fetch_movements(self, item_id=None, after=None, before=None, limit=100):
+        sql = f"SELECT {', '.join(MOVEMENT_COLUMNS)} FROM stock_movements WHERE 1"
+        params = []
+        if item_id is not None:
+            sql += " AND item_id = ?"
+            params.append(item_id)
+
+        backwards = before is not None
+        key = before if backwards else after
+        if key is not None:
+            sql += f" AND (ts, id) {'>' if backwards else '<'} (?, ?)"
+            params += key
+
+        direction = "" if backwards else " DESC"
+        sql += f" ORDER BY ts{direction}, id{direction} LIMIT ?"
+        params.append(limit)
+        return self.read(sql, tuple(params))
+
+    # Items at or below their reorder threshold, lowest stock relative to the
+    # threshold first. Reads only low_stock_alerts, which triggers keep current
+    # (see migrations.low_stock_refresh), so the cost follows the number of
+    # alerts rather than the size of the catalog. CROSS JOIN pins the join
+    # order: with sqlite_stat1 statistics the planner would otherwise scan
+    # inventory and look the alerts up.
+    def fetch_low_stock(self, limit=500):
+        return self.read("""
+            SELECT a.item_id, i.name, (SELECT name FROM categories WHERE id = i.category_id),
+                   a.quantity, a.threshold, a.since
+            FROM low_stock_alerts AS a CROSS JOIN inventory AS i ON i.item_id = a.item_id
+            ORDER BY a.quantity - a.threshold, a.item_id
+            LIMIT ?
+        """, (limit,))
+
+    # Dashboard figures: per-category (category, items, units, stock value in
+    # cents) and items added per day for the most recent days that had any,
+    # newest first. Both come from trigger-maintained rollup tables, so this
+    # costs the same however large the inventory is.
+    def fetch_dashboard(self, days=30):
+        categories = self.read("""
+            SELECT c.name, r.item_count, r.total_units, r.stock_value_cents
+            FROM category_rollups AS r JOIN categories AS c ON c.id = r.category_id
+            ORDER BY c.name
+        """)
+        additions = self.read("""
+            SELECT day, item_count FROM daily_additions ORDER BY day DESC LIMIT ?
+        """, (days,))
+        return categories, additions
+
+    # A threshold of None removes it. An item's own threshold wins over its
+    # category's.
+    def set_item_threshold(self, item_id, threshold):
+        with self.write_transaction():
+            self.set_threshold("item_thresholds", "item_id", "?", item_id, threshold)
+
+    def set_category_threshold(self, category, threshold):
+        with self.write_transaction():
+            self.ensure_category(category)
+            self.set_threshold("category_thresholds", "category_id", CATEGORY_ID, category, threshold)
+
+    # key_sql turns the key parameter into the column's value
+    def set_threshold(self, table, column, key_sql, key, threshold):
+        if threshold is None:
+            self.db.cursor.execute(f"DELETE FROM {table} WHERE {column}={key_sql}", (key,))
+        else:
+            self.db.cursor.execute(f"""
+                INSERT INTO {table} ({column}, threshold) VALUES ({key_sql}, ?)
+                ON CONFLICT({column}) DO UPDATE SET threshold = excluded.threshold
+            """, (key, threshold))
+
+    def export_csv(self, file_path, progress=None, cancel_event=None):
+        return export_inventory_csv(self.db, file_path, progress, cancel_event)
+
+    def import_csv(self, file_path, progress=None, cancel_event=None):
+        try:
+            return import_inventory_csv(self.db, file_path, progress, cancel_event, username=self.username)
+        finally:
+            # Chunks commit as they go, so even a failed import may have written rows
+            inventory_cache.invalidate()
+
+    def close_connection(self):
+        self.db.close_connection()
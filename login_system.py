@@ -1,38 +1,54 @@
 # login_module.py
+# The login and registration screens of the app shell (see app_shell.py). Only
+# what they need is imported here; the database layer is imported on the
+# worker thread.
 import logging
 import customtkinter as ctk
 from tkinter import messagebox
-from database import Database
-import sqlite3
-import hashlib
+from db_worker import deliver
+from login_throttle import login_throttle, PERSIST_FAILURES
+from metrics import metrics
 import re
+import time
 
-# Configure logging
-logging.basicConfig(
-    filename='log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+
+# Runs on the database worker after a successful login: puts the first page of
+# the inventory table (PagedTable's default 100 rows, unfiltered, by item ID)
+# into the shared read cache before the inventory window asks for it
+def prefetch_first_page(db):
+    from inventory_repository import InventoryRepository
+    InventoryRepository(db).fetch_page(limit=100)
+
+
+# Runs on the database worker: returns an error message, or None once the
+# account has been created
+def create_account(db, username, email, password):
+    # Check if username exists
+    if db.username_exists(username):
+        return "Username already exists."
+
+    # Check if email exists
+    if db.email_exists(email):
+        return "Email already registered."
+
+    db.insert_user(username, password, email)
+    return None
+
+# Runs on the database worker: reloads failed logins saved by an earlier run
+def restore_login_failures(db):
+    login_throttle.restore(db.load_login_failures(login_throttle.oldest_relevant_time()))
 
 class LoginSystem:
-    def __init__(self):
-        self.window = ctk.CTk()
-        self.window.title("Login System")
-        self.window.geometry("400x440")
-        self.window.resizable(False, False)
-        self.window.wm_iconbitmap("grocerify_logo.ico")
-        
-        # Configure appearance
-        ctk.set_default_color_theme("green")
-        
-        # Initialize database
-        self.db = Database()
-        self.db.create_default_admin()
-        
+    # Builds both screens once and shows them in the shell's root window
+    def __init__(self, shell):
+        self.shell = shell
+        self.window = shell.root
+        self.worker = shell.worker
+        self.reg_frame = None  # built the first time it's needed
+
         # Create main frame
         self.main_frame = ctk.CTkFrame(self.window)
-        self.main_frame.pack(fill="both", expand=True, padx=20, pady=20)
-        
+
         self.setup_login_gui()
 
     def setup_login_gui(self):
@@ -61,10 +77,10 @@ class LoginSystem:
         self.password_entry.pack()
         
         # Login Button
-        login_button = ctk.CTkButton(login_frame, text="Login",
+        self.login_button = ctk.CTkButton(login_frame, text="Login",
                                    command=self.login,
                                    width=200)
-        login_button.pack(pady=20)
+        self.login_button.pack(pady=20)
         
         # Register Link
         register_button = ctk.CTkButton(login_frame, 
@@ -83,105 +99,124 @@ class LoginSystem:
             messagebox.showerror("Error", "Please fill in all fields.")
             return
 
-        user = self.db.check_user_credentials(username, password)
-        
-        if user:
-            # Successful login
-            self.db.update_last_login(username)
-            logging.info(f"User '{username}' logged in successfully as '{user[1]}'")
-            self.window.destroy()
-            role = user[1]
-
-            self.handle_user_role(username, role)
-        else:
-            logging.warning(f"Failed login attempt for username '{username}'")
-            messagebox.showerror("Error", "Invalid username or password.")
+        # Throttled attempts are turned away before any hashing or SQL
+        wait = login_throttle.retry_after(username)
+        if wait:
+            messagebox.showerror("Error", f"Too many failed attempts. Try again in {int(wait) + 1} seconds.")
+            return
+
+        def checked(user):
+            self.login_button.configure(state="normal", text="Login")
+            duration = round((time.perf_counter() - started) * 1000, 1)
+            metrics.record("login", duration)
+            if user:
+                # Successful login
+                login_throttle.record_success(username)
+                if PERSIST_FAILURES:
+                    self.worker.submit("clear_login_failures", username)
+                self.worker.submit("update_last_login", username)
+                self.worker.submit(prefetch_first_page)
+                logging.info("User '%s' logged in successfully as '%s'", username, user[1],
+                             extra={"event": "login", "user": username, "duration_ms": duration})
+                role = user[1]
+
+                self.handle_user_role(username, role)
+            else:
+                failed_at = time.time()
+                if login_throttle.record_failure(username, failed_at):
+                    logging.warning("Username '%s' locked out after repeated failed logins", username,
+                                    extra={"event": "login_locked", "user": username})
+                else:
+                    logging.warning("Failed login attempt for username '%s'", username,
+                                    extra={"event": "login_failed", "user": username})
+                if PERSIST_FAILURES:
+                    self.worker.submit("record_login_failure", username, failed_at)
+                messagebox.showerror("Error", "Invalid username or password.")
+
+        def failed(error):
+            self.login_button.configure(state="normal", text="Login")
+            logging.error("Login check failed for username '%s': %s", username, error,
+                          extra={"event": "login_error", "user": username})
+            messagebox.showerror("Error", f"Could not check credentials: {str(error)}")
+
+        # Keep the window responsive while the credentials are checked
+        self.login_button.configure(state="disabled", text="Logging in...")
+        started = time.perf_counter()
+        future = self.worker.submit("check_user_credentials", username, password)
+        deliver(self.window, future, checked, failed)
 
     def handle_user_role(self, username, role):
-        if role == "admin":
+        if role in ("admin", "user"):
             # Start the inventory management system
-            messagebox.showinfo(f"Welcome, admin.", f"Welcome to Grocerify, {username}.")
-            from inventory import InventoryManager
-            app = InventoryManager(username, role)  # Pass username and role
-            app.run()
-
-        elif role == "user":
-            messagebox.showinfo(f"Welcome, user.", f"Welcome to Grocerify, {username}.")
-            from inventory import InventoryManagerUser
-            app = InventoryManagerUser(username, role)  # Pass username and role
-            app.run()
+            messagebox.showinfo(f"Welcome, {role}.", f"Welcome to Grocerify, {username}.")
+            self.shell.open_inventory(username, role)
 
     def show_register(self):
-            # Destroy the login window
-            self.window.destroy()
-
-            # Create registration window
-            self.reg_window = ctk.CTk()
-            self.reg_window.title("Register New Account")
-            self.reg_window.geometry("400x500")
-            self.reg_window.resizable(False, False)
-            self.reg_window.wm_iconbitmap("grocerify_logo.ico")
-            
-            # Registration frame
-            reg_frame = ctk.CTkFrame(self.reg_window)
-            reg_frame.pack(pady=20, padx=40, fill="both", expand=True)
-            
-            # Title
-            title_label = ctk.CTkLabel(reg_frame, 
-                                    text="Create New Account",
-                                    font=ctk.CTkFont(size=20, weight="bold"))
-            title_label.pack(pady=20)
-            
-            # Username
-            username_label = ctk.CTkLabel(reg_frame, text="Username:")
-            username_label.pack(pady=5)
-            self.reg_username = ctk.CTkEntry(reg_frame, width=200)
-            self.reg_username.pack()
-            
-            # Email
-            email_label = ctk.CTkLabel(reg_frame, text="Email:")
-            email_label.pack(pady=5)
-            self.reg_email = ctk.CTkEntry(reg_frame, width=200)
-            self.reg_email.pack()
-            
-            # Password
-            password_label = ctk.CTkLabel(reg_frame, text="Password:")
-            password_label.pack(pady=5)
-            self.reg_password = ctk.CTkEntry(reg_frame, width=200, show="●")
-            self.reg_password.pack()
-            
-            # Confirm Password
-            conf_password_label = ctk.CTkLabel(reg_frame, text="Confirm Password:")
-            conf_password_label.pack(pady=5)
-            self.reg_conf_password = ctk.CTkEntry(reg_frame, width=200, show="●")
-            self.reg_conf_password.pack()
-            
-            # Register Button
-            register_button = ctk.CTkButton(reg_frame,
-                                        text="Register",
-                                        command=self.register_user,
-                                        width=200)
-            register_button.pack(pady=20)
-
-            # Back Button
-            back_button = ctk.CTkButton(reg_frame, text="Back", command=self.show_login, width=100, fg_color="red")
-            back_button.pack(pady=6)
-
-            # Start the main loop for the registration window
-            self.reg_window.mainloop()
+        if self.reg_frame is None:
+            self.setup_register_gui()
+        for entry in (self.reg_username, self.reg_email, self.reg_password, self.reg_conf_password):
+            entry.delete(0, "end")
+        self.shell.show(self.reg_frame, "Register New Account", "400x500", resizable=False)
+
+    def setup_register_gui(self):
+        self.reg_frame = ctk.CTkFrame(self.window, fg_color="transparent")
+
+        # Registration frame
+        reg_frame = ctk.CTkFrame(self.reg_frame)
+        reg_frame.pack(pady=20, padx=40, fill="both", expand=True)
+        
+        # Title
+        title_label = ctk.CTkLabel(reg_frame, 
+                                text="Create New Account",
+                                font=ctk.CTkFont(size=20, weight="bold"))
+        title_label.pack(pady=20)
+        
+        # Username
+        username_label = ctk.CTkLabel(reg_frame, text="Username:")
+        username_label.pack(pady=5)
+        self.reg_username = ctk.CTkEntry(reg_frame, width=200)
+        self.reg_username.pack()
+        
+        # Email
+        email_label = ctk.CTkLabel(reg_frame, text="Email:")
+        email_label.pack(pady=5)
+        self.reg_email = ctk.CTkEntry(reg_frame, width=200)
+        self.reg_email.pack()
+        
+        # Password
+        password_label = ctk.CTkLabel(reg_frame, text="Password:")
+        password_label.pack(pady=5)
+        self.reg_password = ctk.CTkEntry(reg_frame, width=200, show="●")
+        self.reg_password.pack()
+        
+        # Confirm Password
+        conf_password_label = ctk.CTkLabel(reg_frame, text="Confirm Password:")
+        conf_password_label.pack(pady=5)
+        self.reg_conf_password = ctk.CTkEntry(reg_frame, width=200, show="●")
+        self.reg_conf_password.pack()
+        
+        # Register Button
+        register_button = ctk.CTkButton(reg_frame,
+                                    text="Register",
+                                    command=self.register_user,
+                                    width=200)
+        register_button.pack(pady=20)
+
+        # Back Button
+        back_button = ctk.CTkButton(reg_frame, text="Back", command=self.show_login, width=100, fg_color="red")
+        back_button.pack(pady=6)
 
     def show_login(self):
-        self.reg_window.destroy()
-        self.__init__()
-        self.run()
+        # The password never stays on screen once the user has moved on
+        self.password_entry.delete(0, "end")
+        self.login_button.configure(state="normal", text="Login")
+        self.shell.show(self.main_frame, "Login System", "400x440", resizable=False, padding=20)
 
-    def register_user(self, db_name="Grocerify_Database.db"):
+    def register_user(self):
         username = self.reg_username.get()
         email = self.reg_email.get()
         password = self.reg_password.get()
         conf_password = self.reg_conf_password.get()
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
         
         # Validation
         if not all([username, email, password, conf_password]):
@@ -197,32 +232,16 @@ class LoginSystem:
         if not re.match(email_pattern, email):
             messagebox.showerror("Error", "Invalid email format.")
             return
-        
-        # Check if username exists
-        self.cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
-        if self.cursor.fetchone():
-            messagebox.showerror("Error", "Username already exists.")
-            return
-        
-        # Check if email exists
-        self.cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        if self.cursor.fetchone():
-            messagebox.showerror("Error", "Email already registered.")
-            return
-        
-        # Hash password and save user
-        hashed_password = hashlib.sha256(password.encode()).hexdigest()
-        try:
-            self.cursor.execute("""
-                INSERT INTO users (username, password, email, role)
-                VALUES (?, ?, ?, ?)
-            """, (username, hashed_password, email, 'user'))
-            self.conn.commit()
+
+        def registered(error_message):
+            if error_message:
+                messagebox.showerror("Error", error_message)
+                return
             messagebox.showinfo("Success", "Account created successfully!")
             self.show_login()
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create account: {str(e)}")
-    
 
-    def run(self):
-        self.window.mainloop()
\ No newline at end of file
+        def failed(error):
+            messagebox.showerror("Error", f"Failed to create account: {str(error)}")
+
+        future = self.worker.submit(create_account, username, email, password)
+        deliver(self.reg_frame, future, registered, failed)
@@ -0,0 +1,81 @@
+# login_throttle.py
+# Sliding-window limits on failed logins, per username and across all users.
+# Checked before any hashing or SQL, so a stuck scanner or a brute-force script
+# costs a dictionary lookup per attempt instead of a KDF run and a log line.
+# Failures can be mirrored to the login_failures table so a restart doesn't
+# reset an ongoing lockout.
+import threading
+import time
+from collections import deque
+
+# Keep lockouts across restarts by mirroring failures to the database
+PERSIST_FAILURES = True
+
+
+class LoginThrottle:
+    def __init__(self, user_limit=5, user_window=300, global_limit=50, global_window=60,
+                 max_tracked_users=10000, clock=time.time):
+        self.user_limit = user_limit
+        self.user_window = user_window
+        self.global_limit = global_limit
+        self.global_window = global_window
+        self.max_tracked_users = max_tracked_users
+        self.clock = clock
+        self._user_failures = {}  # username -> deque of failure times
+        self._global_failures = deque()
+        self._lock = threading.Lock()
+
+    # Seconds until the username may try again; 0 when it may try now
+    def retry_after(self, username):
+        now = self.clock()
+        with self._lock:
+            self._prune(self._global_failures, now - self.global_window)
+            wait = 0
+            if len(self._global_failures) >= self.global_limit:
+                wait = self._global_failures[0] + self.global_window - now
+
+            failures = self._user_failures.get(username)
+            if failures is not None:
+                self._prune(failures, now - self.user_window)
+                if not failures:
+                    del self._user_failures[username]
+                elif len(failures) >= self.user_limit:
+                    wait = max(wait, failures[0] + self.user_window - now)
+        return max(wait, 0)
+
+    # Returns True when this failure locks the username out
+    def record_failure(self, username, when=None):
+        when = self.clock() if when is None else when
+        with self._lock:
+            failures = self._user_failures.get(username)
+            if failures is None:
+                if len(self._user_failures) >= self.max_tracked_users:
+                    # Forget the user whose last failure is oldest
+                    stale = min(self._user_failures, key=lambda name: self._user_failures[name][-1])
+                    del self._user_failures[stale]
+                failures = self._user_failures[username] = deque()
+            failures.append(when)
+            self._global_failures.append(when)
+            if len(failures) > self.user_limit:
+                failures.popleft()
+            return len(failures) == self.user_limit
+
+    def record_success(self, username):
+        with self._lock:
+            self._user_failures.pop(username, None)
+
+    # Loads failures saved by an earlier run, as (username, time) pairs
+    def restore(self, failures):
+        for username, when in sorted(failures, key=lambda failure: failure[1]):
+            self.record_failure(username, when)
+
+    def oldest_relevant_time(self):
+        return self.clock() - max(self.user_window, self.global_window)
+
+    @staticmethod
+    def _prune(times, cutoff):
+        while times and times[0] <= cutoff:
+            times.popleft()
+
+
+login_throttle = LoginThrottle()
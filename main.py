@@ -1,6 +1,8 @@
-# Description: This is the main file that runs the login system. It creates an instance of the LoginSystem class and runs the run method.
-from login_system import LoginSystem
+# Description: This is the main file that runs Grocerify. It creates the AppShell, which opens on the login screen, and runs its mainloop.
+from app_shell import AppShell
+from app_logging import setup_logging
 
 if __name__ == "__main__":
-    login = LoginSystem()
-    login.run()
+    setup_logging()
+    app = AppShell()
+    app.run()
@@ -0,0 +1,141 @@
+# metrics.py
+# In-process counters and latency histograms for the hot paths: every SQL
+# statement, every call made on the database worker, table refreshes, exports,
+# imports and logins (connection_pool.py times the SQL). Recording a sample is
+# a lock, a bisect and two additions, and collection can be switched off at
+# runtime (metrics.enabled). Statements slower than slow_query_ms are logged
+# with their SQL and row count.
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+# Histogram bucket upper bounds in milliseconds: four buckets per doubling
+# from 10 us to about 3 minutes, so percentiles are within ~19% of the truth
+BUCKET_BOUNDS_MS = [0.01 * 2 ** (i / 4) for i in range(97)]
+
+DEFAULT_SLOW_QUERY_MS = 200.0
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)  # last one is overflow
+
+    def record(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.buckets[bisect_left(BUCKET_BOUNDS_MS, ms)] += 1
+
+    # Upper bound of the bucket holding the given fraction of samples
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, size in enumerate(self.buckets):
+            seen += size
+            if seen >= rank:
+                return min(BUCKET_BOUNDS_MS[index], self.max_ms) if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.50), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "p99_ms": round(self.percentile(0.99), 3),
+            "max_ms": round(self.max_ms, 3),
+        }
+
+
+class Metrics:
+    def __init__(self, enabled=True, slow_query_ms=DEFAULT_SLOW_QUERY_MS, max_slow_queries=100):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.started_at = datetime.now()
+        self._histograms = {}  # name -> Histogram
+        self._counters = {}  # name -> int
+        self._slow_queries = deque(maxlen=max_slow_queries)  # most recent last
+        self._lock = threading.Lock()
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(ms)
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # with metrics.timer("export"): ... records how long the block took
+    def timer(self, name):
+        return _Timer(self, name)
+
+    def record_query(self, sql, ms, rows):
+        kind = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else "?"
+        self.record(f"sql.{kind.lower()}", ms)
+        if ms >= self.slow_query_ms:
+            statement = " ".join(sql.split())
+            with self._lock:
+                self._slow_queries.append({
+                    "ts": datetime.now().isoformat(timespec="seconds"),
+                    "duration_ms": round(ms, 3),
+                    "rows": rows,
+                    "sql": statement,
+                })
+            logging.warning("Slow query (%.1f ms, %s rows): %s", ms, rows, statement,
+                            extra={"event": "slow_query", "duration_ms": round(ms, 1)})
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "taken_at": datetime.now().isoformat(timespec="seconds"),
+                "enabled": self.enabled,
+                "slow_query_ms": self.slow_query_ms,
+                "timings": {name: histogram.summary() for name, histogram in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+                "slow_queries": list(self._slow_queries),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._slow_queries.clear()
+            self.started_at = datetime.now()
+
+    def dump(self, file_path):
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+
+class _Timer:
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.record(self.name, (time.perf_counter() - self.started) * 1000)
+
+
+metrics = Metrics()
@@ -0,0 +1,753 @@
+# migrations.py
+# Versioned schema upgrades for existing database files. PRAGMA user_version
+# records the last migration a file received. Each migration's schema changes
+# run in one transaction together with the version bump, so a failed upgrade
+# leaves the file exactly as it was.
+#
+# Filling new columns or tables from existing rows is done by backfills instead.
+# They run after the schema change, in small batches with a commit between each
+# batch, so other connections can keep reading and writing during an upgrade of
+# a multi-gigabyte file. They are resumable: an interrupted backfill carries on
+# from where it stopped the next time the database is opened. A migration is
+# only applied once every earlier backfill has finished, so a backfill's SQL
+# always meets the schema of its own version and a migration can rely on the
+# rows its predecessors filled in.
+import logging
+import sqlite3
+import time
+
+
+class Backfill:
+    def __init__(self, name, sql, batch_size=10000):
+        # sql must process at most "?" rows per execution and touch only rows
+        # that still need it, so running it again until nothing changes is safe
+        self.name = name
+        self.sql = sql
+        self.batch_size = batch_size
+
+
+class Migration:
+    def __init__(self, description, statements=(), backfills=()):
+        self.description = description
+        self.statements = list(statements)
+        self.backfills = list(backfills)
+
+
+# Trigger body that brings low_stock_alerts up to date for the inventory rows
+# matching where (an expression over "i"). An item is low when its quantity is
+# at or below its own threshold, or else its category's. category names the
+# column that links inventory to category_thresholds in the schema version
+# the trigger is created for.
+def low_stock_refresh(where, category="category"):
+    threshold = f"""COALESCE(
+        (SELECT threshold FROM item_thresholds WHERE item_id = i.item_id),
+        (SELECT threshold FROM category_thresholds WHERE {category} = i.{category}))"""
+    return f"""
+        DELETE FROM low_stock_alerts WHERE item_id IN (
+            SELECT i.item_id FROM inventory AS i
+            WHERE {where} AND NOT COALESCE(i.quantity <= {threshold}, 0)
+        );
+        INSERT INTO low_stock_alerts (item_id, quantity, threshold, since)
+        SELECT item_id, quantity, threshold, DATETIME('now', 'localtime') FROM (
+            SELECT i.item_id, i.quantity, {threshold} AS threshold
+            FROM inventory AS i WHERE {where}
+        ) WHERE quantity <= threshold
+        ON CONFLICT(item_id) DO UPDATE SET quantity = excluded.quantity, threshold = excluded.threshold;
+    """
+
+
+# Trigger bodies that add one inventory row (new) to, or take one (old) out
+# of, the dashboard rollups. Stock value is kept in whole cents so repeated
+# additions and subtractions never drift. category is as for low_stock_refresh.
+def rollup_add(row, category="category"):
+    return f"""
+        INSERT INTO category_rollups ({category}, item_count, total_units, stock_value_cents)
+        VALUES ({row}.{category}, 1, {row}.quantity, CAST(ROUND({row}.price * 100) AS INTEGER) * {row}.quantity)
+        ON CONFLICT({category}) DO UPDATE SET
+            item_count = item_count + 1,
+            total_units = total_units + excluded.total_units,
+            stock_value_cents = stock_value_cents + excluded.stock_value_cents;
+        INSERT INTO daily_additions (day, item_count) VALUES (substr({row}.date_added, 1, 10), 1)
+        ON CONFLICT(day) DO UPDATE SET item_count = item_count + 1;
+    """
+
+
+def rollup_remove(row, category="category"):
+    return f"""
+        UPDATE category_rollups SET
+            item_count = item_count - 1,
+            total_units = total_units - {row}.quantity,
+            stock_value_cents = stock_value_cents - CAST(ROUND({row}.price * 100) AS INTEGER) * {row}.quantity
+        WHERE {category} = {row}.{category};
+        DELETE FROM category_rollups WHERE {category} = {row}.{category} AND item_count <= 0;
+        UPDATE daily_additions SET item_count = item_count - 1 WHERE day = substr({row}.date_added, 1, 10);
+        DELETE FROM daily_additions WHERE day = substr({row}.date_added, 1, 10) AND item_count <= 0;
+    """
+
+
+# GLOB pattern for the item IDs the sequence hands out: ITEM- and eight digits
+GENERATED_ITEM_ID = "ITEM-" + "[0-9]" * 8
+
+
+# Index i holds the migration that upgrades a file to version i + 1
+MIGRATIONS = [
+    Migration(
+        "Indexes for the export sort, category/name lookups and email checks",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory(category)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_date_added ON inventory(date_added)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name COLLATE NOCASE)",
+            "CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)",
+        ],
+    ),
+    Migration(
+        "Bookkeeping table for resumable backfills",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS schema_backfills (
+                version INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                completed_at DATETIME,
+                PRIMARY KEY (version, name)
+            )
+            """,
+        ],
+    ),
+    Migration(
+        "Full-text search over item ID, name and category; (category, item_id) index for filtered paging",
+        [
+            # inventory has no INTEGER PRIMARY KEY, so a VACUUM may renumber its
+            # rowids; run InventoryRepository.rebuild_search_index() after one
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS inventory_fts
+            USING fts5(item_id, name, category, tokenize = 'unicode61')
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                VALUES (new.rowid, new.item_id, new.name, new.category);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+                DELETE FROM inventory_fts WHERE rowid = old.rowid;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF item_id, name, category ON inventory BEGIN
+                DELETE FROM inventory_fts WHERE rowid = old.rowid;
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                VALUES (new.rowid, new.item_id, new.name, new.category);
+            END
+            """,
+            "DROP INDEX IF EXISTS idx_inventory_category",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_category ON inventory(category, item_id)",
+        ],
+        [
+            Backfill("index_existing_items", """
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                SELECT rowid, item_id, name, category FROM inventory AS i
+                WHERE NOT EXISTS (SELECT 1 FROM inventory_fts WHERE rowid = i.rowid)
+                LIMIT ?
+            """),
+        ],
+    ),
+    Migration(
+        "(column, item_id) indexes so every sortable column pages by keyset",
+        [
+            "DROP INDEX IF EXISTS idx_inventory_name",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_name ON inventory(name COLLATE NOCASE, item_id)",
+            "DROP INDEX IF EXISTS idx_inventory_date_added",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_date_added ON inventory(date_added, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_price ON inventory(price, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_quantity ON inventory(quantity, item_id)",
+        ],
+    ),
+    Migration(
+        "Persistent sequence for generated item IDs",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS id_sequences (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            """,
+            "INSERT OR IGNORE INTO id_sequences (name, value) VALUES ('item', 0)",
+        ],
+    ),
+    Migration(
+        "Per-installation settings such as the password hashing cost",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS app_settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+            """,
+        ],
+    ),
+    Migration(
+        "Recent failed logins, so lockouts survive a restart",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS login_failures (
+                username TEXT NOT NULL,
+                ts REAL NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_login_failures_ts ON login_failures(ts)",
+        ],
+    ),
+    Migration(
+        "Append-only stock movement history for every item change",
+        [
+            # One row per save, update or delete, written in the same
+            # transaction as the change itself (see InventoryRepository)
+            """
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL,
+                ts TEXT NOT NULL,
+                username TEXT,
+                action TEXT NOT NULL,
+                old_name TEXT,
+                old_price REAL,
+                old_quantity INTEGER,
+                old_category TEXT,
+                new_name TEXT,
+                new_price REAL,
+                new_quantity INTEGER,
+                new_category TEXT,
+                quantity_delta INTEGER NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_item ON stock_movements(item_id, ts)",
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_ts ON stock_movements(ts)",
+            """
+            CREATE TRIGGER IF NOT EXISTS stock_movements_no_update BEFORE UPDATE ON stock_movements BEGIN
+                SELECT RAISE(ABORT, 'stock_movements is append-only');
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS stock_movements_no_delete BEFORE DELETE ON stock_movements BEGIN
+                SELECT RAISE(ABORT, 'stock_movements is append-only');
+            END
+            """,
+        ],
+    ),
+    Migration(
+        "Reorder thresholds and a trigger-maintained table of low-stock items",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS item_thresholds (
+                item_id TEXT PRIMARY KEY,
+                threshold INTEGER NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS category_thresholds (
+                category TEXT PRIMARY KEY,
+                threshold INTEGER NOT NULL
+            )
+            """,
+            # Holds only the items that are low right now, so reading it never
+            # touches the rest of the catalog
+            """
+            CREATE TABLE IF NOT EXISTS low_stock_alerts (
+                item_id TEXT PRIMARY KEY,
+                quantity INTEGER NOT NULL,
+                threshold INTEGER NOT NULL,
+                since TEXT NOT NULL
+            )
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_insert AFTER INSERT ON inventory BEGIN
+                {low_stock_refresh("i.item_id = new.item_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_update AFTER UPDATE OF item_id, quantity, category ON inventory BEGIN
+                DELETE FROM low_stock_alerts WHERE item_id = old.item_id AND old.item_id <> new.item_id;
+                {low_stock_refresh("i.item_id = new.item_id")}
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS low_stock_delete AFTER DELETE ON inventory BEGIN
+                DELETE FROM low_stock_alerts WHERE item_id = old.item_id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_set AFTER INSERT ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id = new.item_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_change AFTER UPDATE ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id IN (old.item_id, new.item_id)")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_clear AFTER DELETE ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id = old.item_id")}
+            END
+            """,
+            # A category threshold re-evaluates the items of that category only,
+            # through the (category, item_id) index
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_set AFTER INSERT ON category_thresholds BEGIN
+                {low_stock_refresh("i.category = new.category")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_change AFTER UPDATE ON category_thresholds BEGIN
+                {low_stock_refresh("i.category IN (old.category, new.category)")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_clear AFTER DELETE ON category_thresholds BEGIN
+                {low_stock_refresh("i.category = old.category")}
+            END
+            """,
+        ],
+    ),
+    Migration(
+        "Per-category and per-day rollups for the dashboard, kept current by triggers",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS category_rollups (
+                category TEXT PRIMARY KEY,
+                item_count INTEGER NOT NULL,
+                total_units INTEGER NOT NULL,
+                stock_value_cents INTEGER NOT NULL
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS daily_additions (
+                day TEXT PRIMARY KEY,
+                item_count INTEGER NOT NULL
+            )
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_insert AFTER INSERT ON inventory BEGIN
+                {rollup_add("new")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_update AFTER UPDATE OF price, quantity, category, date_added ON inventory BEGIN
+                {rollup_remove("old")}
+                {rollup_add("new")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_delete AFTER DELETE ON inventory BEGIN
+                {rollup_remove("old")}
+            END
+            """,
+            # Seeded in the same transaction that creates the triggers, so no
+            # write can be counted twice or missed. This is the only full pass
+            # over the inventory the dashboard ever needs.
+            "DELETE FROM category_rollups",
+            """
+            INSERT INTO category_rollups (category, item_count, total_units, stock_value_cents)
+            SELECT category, COUNT(*), SUM(quantity), SUM(CAST(ROUND(price * 100) AS INTEGER) * quantity)
+            FROM inventory GROUP BY category
+            """,
+            "DELETE FROM daily_additions",
+            """
+            INSERT INTO daily_additions (day, item_count)
+            SELECT substr(date_added, 1, 10), COUNT(*) FROM inventory GROUP BY 1
+            """,
+        ],
+    ),
+    Migration(
+        "Categories table and a copy of inventory that refers to them by integer ID",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS categories (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+            """,
+            # The categories the entry form used to offer, in the same order,
+            # then every other category in use. category_rollups holds one row
+            # per category in the inventory, so this needs no pass over it.
+            """
+            INSERT OR IGNORE INTO categories (name)
+            VALUES ('Meat'), ('Vegetables'), ('Fruits'), ('Dairy Products'), ('Beverages')
+            """,
+            """
+            INSERT OR IGNORE INTO categories (name)
+            SELECT category FROM category_rollups UNION SELECT category FROM category_thresholds ORDER BY 1
+            """,
+            # SQLite can't change a column's type in place, so the rows are
+            # copied into inventory_new by the copy_inventory backfill and the
+            # tables are swapped by the next migration. The indexes exist from
+            # the start, so the swap doesn't have to build them.
+            """
+            CREATE TABLE IF NOT EXISTS inventory_new (
+                item_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                price REAL NOT NULL,
+                quantity INTEGER NOT NULL,
+                category_id INTEGER NOT NULL REFERENCES categories(id),
+                date_added TEXT NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_inventory_by_category ON inventory_new(category_id, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_by_name ON inventory_new(name COLLATE NOCASE, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_by_date_added ON inventory_new(date_added, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_by_price ON inventory_new(price, item_id)",
+            "CREATE INDEX IF NOT EXISTS idx_inventory_by_quantity ON inventory_new(quantity, item_id)",
+            # The backfill copies rows up to the last rowid there was when the
+            # copy started, in rowid order. Rows added after that are copied
+            # by inventory_copy_insert as they arrive.
+            """
+            CREATE TABLE IF NOT EXISTS inventory_copy (
+                last_rowid INTEGER NOT NULL
+            )
+            """,
+            "INSERT INTO inventory_copy (last_rowid) SELECT COALESCE(MAX(rowid), 0) FROM inventory",
+            # Writes made while the copy runs keep the copied rows current.
+            # Rows the backfill hasn't reached yet are left to it; it copies
+            # whatever they hold by then. Every category a write mentions is
+            # added first, so each row the backfill reaches has an ID to map to.
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_copy_insert AFTER INSERT ON inventory BEGIN
+                INSERT OR IGNORE INTO categories (name) VALUES (new.category);
+                INSERT INTO inventory_new (rowid, item_id, name, price, quantity, category_id, date_added)
+                SELECT new.rowid, new.item_id, new.name, new.price, new.quantity,
+                       (SELECT id FROM categories WHERE name = new.category), new.date_added
+                WHERE new.rowid > (SELECT last_rowid FROM inventory_copy);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_copy_update AFTER UPDATE ON inventory BEGIN
+                INSERT OR IGNORE INTO categories (name) VALUES (new.category);
+                UPDATE inventory_new SET
+                    item_id = new.item_id, name = new.name, price = new.price, quantity = new.quantity,
+                    category_id = (SELECT id FROM categories WHERE name = new.category), date_added = new.date_added
+                WHERE rowid = old.rowid;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_copy_delete AFTER DELETE ON inventory BEGIN
+                DELETE FROM inventory_new WHERE rowid = old.rowid;
+            END
+            """,
+        ],
+        [
+            # Rowids are kept, so inventory_fts still points at the right rows
+            # after the swap. Each batch starts after the highest rowid copied
+            # so far, one seek on inventory_new's rowid B-tree.
+            Backfill("copy_inventory", """
+                INSERT INTO inventory_new (rowid, item_id, name, price, quantity, category_id, date_added)
+                SELECT i.rowid, i.item_id, i.name, i.price, i.quantity,
+                       (SELECT id FROM categories WHERE name = i.category), i.date_added
+                FROM inventory AS i
+                WHERE i.rowid > COALESCE((
+                    SELECT MAX(rowid) FROM inventory_new WHERE rowid <= (SELECT last_rowid FROM inventory_copy)
+                ), 0)
+                AND i.rowid <= (SELECT last_rowid FROM inventory_copy)
+                ORDER BY i.rowid
+                LIMIT ?
+            """),
+        ],
+    ),
+    Migration(
+        "Swap in the inventory that refers to categories by ID; thresholds and rollups follow",
+        [
+            # A rename checks every trigger in the schema, so the threshold
+            # triggers that read inventory go first; the ones on inventory
+            # itself, the copy triggers among them, go with the old table
+            "DROP TRIGGER IF EXISTS low_stock_item_threshold_set",
+            "DROP TRIGGER IF EXISTS low_stock_item_threshold_change",
+            "DROP TRIGGER IF EXISTS low_stock_item_threshold_clear",
+            "DROP TRIGGER IF EXISTS low_stock_category_threshold_set",
+            "DROP TRIGGER IF EXISTS low_stock_category_threshold_change",
+            "DROP TRIGGER IF EXISTS low_stock_category_threshold_clear",
+            "DROP TABLE inventory",
+            "DROP TABLE inventory_copy",
+            "ALTER TABLE inventory_new RENAME TO inventory",
+            # Search still matches category names
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_insert AFTER INSERT ON inventory BEGIN
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                VALUES (new.rowid, new.item_id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_delete AFTER DELETE ON inventory BEGIN
+                DELETE FROM inventory_fts WHERE rowid = old.rowid;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF item_id, name, category_id ON inventory BEGIN
+                DELETE FROM inventory_fts WHERE rowid = old.rowid;
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                VALUES (new.rowid, new.item_id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+            END
+            """,
+            # Category thresholds and rollups hold a row per category, so they
+            # are re-keyed by category ID here
+            """
+            CREATE TABLE category_thresholds_new (
+                category_id INTEGER PRIMARY KEY REFERENCES categories(id),
+                threshold INTEGER NOT NULL
+            )
+            """,
+            """
+            INSERT INTO category_thresholds_new (category_id, threshold)
+            SELECT c.id, t.threshold FROM category_thresholds AS t JOIN categories AS c ON c.name = t.category
+            """,
+            "DROP TABLE category_thresholds",
+            "ALTER TABLE category_thresholds_new RENAME TO category_thresholds",
+            """
+            CREATE TABLE category_rollups_new (
+                category_id INTEGER PRIMARY KEY REFERENCES categories(id),
+                item_count INTEGER NOT NULL,
+                total_units INTEGER NOT NULL,
+                stock_value_cents INTEGER NOT NULL
+            )
+            """,
+            """
+            INSERT INTO category_rollups_new (category_id, item_count, total_units, stock_value_cents)
+            SELECT c.id, r.item_count, r.total_units, r.stock_value_cents
+            FROM category_rollups AS r JOIN categories AS c ON c.name = r.category
+            """,
+            "DROP TABLE category_rollups",
+            "ALTER TABLE category_rollups_new RENAME TO category_rollups",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_insert AFTER INSERT ON inventory BEGIN
+                {low_stock_refresh("i.item_id = new.item_id", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_update AFTER UPDATE OF item_id, quantity, category_id ON inventory BEGIN
+                DELETE FROM low_stock_alerts WHERE item_id = old.item_id AND old.item_id <> new.item_id;
+                {low_stock_refresh("i.item_id = new.item_id", "category_id")}
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS low_stock_delete AFTER DELETE ON inventory BEGIN
+                DELETE FROM low_stock_alerts WHERE item_id = old.item_id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_set AFTER INSERT ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id = new.item_id", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_change AFTER UPDATE ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id IN (old.item_id, new.item_id)", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_item_threshold_clear AFTER DELETE ON item_thresholds BEGIN
+                {low_stock_refresh("i.item_id = old.item_id", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_set AFTER INSERT ON category_thresholds BEGIN
+                {low_stock_refresh("i.category_id = new.category_id", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_change AFTER UPDATE ON category_thresholds BEGIN
+                {low_stock_refresh("i.category_id IN (old.category_id, new.category_id)", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_category_threshold_clear AFTER DELETE ON category_thresholds BEGIN
+                {low_stock_refresh("i.category_id = old.category_id", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_insert AFTER INSERT ON inventory BEGIN
+                {rollup_add("new", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_update AFTER UPDATE OF price, quantity, category_id, date_added ON inventory BEGIN
+                {rollup_remove("old", "category_id")}
+                {rollup_add("new", "category_id")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_delete AFTER DELETE ON inventory BEGIN
+                {rollup_remove("old", "category_id")}
+            END
+            """,
+        ],
+    ),
+    Migration(
+        "Update triggers skip rows whose searched, stocked or rolled-up values didn't change",
+        [
+            # UPDATE OF fires whenever a column is assigned, even to the value
+            # it already has, and every edit and import assigns them all. With
+            # a WHEN clause a quantity change no longer rewrites the item's
+            # search entry, and a rename leaves the rollups alone.
+            "DROP TRIGGER IF EXISTS inventory_fts_update",
+            """
+            CREATE TRIGGER IF NOT EXISTS inventory_fts_update AFTER UPDATE OF item_id, name, category_id ON inventory
+            WHEN old.item_id IS NOT new.item_id OR old.name IS NOT new.name OR old.category_id IS NOT new.category_id
+            BEGIN
+                DELETE FROM inventory_fts WHERE rowid = old.rowid;
+                INSERT INTO inventory_fts (rowid, item_id, name, category)
+                VALUES (new.rowid, new.item_id, new.name, (SELECT name FROM categories WHERE id = new.category_id));
+            END
+            """,
+            "DROP TRIGGER IF EXISTS low_stock_update",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS low_stock_update AFTER UPDATE OF item_id, quantity, category_id ON inventory
+            WHEN old.item_id IS NOT new.item_id OR old.quantity IS NOT new.quantity
+                OR old.category_id IS NOT new.category_id
+            BEGIN
+                DELETE FROM low_stock_alerts WHERE item_id = old.item_id AND old.item_id <> new.item_id;
+                {low_stock_refresh("i.item_id = new.item_id", "category_id")}
+            END
+            """,
+            "DROP TRIGGER IF EXISTS rollup_update",
+            f"""
+            CREATE TRIGGER IF NOT EXISTS rollup_update AFTER UPDATE OF price, quantity, category_id, date_added ON inventory
+            WHEN old.price IS NOT new.price OR old.quantity IS NOT new.quantity
+                OR old.category_id IS NOT new.category_id OR old.date_added IS NOT new.date_added
+            BEGIN
+                {rollup_remove("old", "category_id")}
+                {rollup_add("new", "category_id")}
+            END
+            """,
+        ],
+    ),
+    Migration(
+        "The item ID sequence follows generated-looking IDs that were typed in or imported",
+        [
+            # Allocation used to look for such IDs in the primary key index,
+            # which also holds every other ITEM- key that sorts between them.
+            # The sequence is seeded once here and kept current by triggers.
+            f"""
+            UPDATE id_sequences SET value = MAX(value, COALESCE((
+                SELECT MAX(CAST(substr(item_id, 6) AS INTEGER)) FROM inventory
+                WHERE item_id GLOB '{GENERATED_ITEM_ID}'
+            ), 0))
+            WHERE name = 'item'
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS id_sequence_insert AFTER INSERT ON inventory
+            WHEN new.item_id GLOB '{GENERATED_ITEM_ID}'
+            BEGIN
+                UPDATE id_sequences SET value = CAST(substr(new.item_id, 6) AS INTEGER)
+                WHERE name = 'item' AND value < CAST(substr(new.item_id, 6) AS INTEGER);
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS id_sequence_update AFTER UPDATE OF item_id ON inventory
+            WHEN new.item_id GLOB '{GENERATED_ITEM_ID}'
+            BEGIN
+                UPDATE id_sequences SET value = CAST(substr(new.item_id, 6) AS INTEGER)
+                WHERE name = 'item' AND value < CAST(substr(new.item_id, 6) AS INTEGER);
+            END
+            """,
+        ],
+    ),
+    Migration(
+        "The low-stock insert trigger works from the new row alone",
+        [
+            # A new item ID has no alert to clear and its values are all in
+            # "new", so the trigger skips the inventory lookups and the DELETE
+            # of low_stock_refresh; items that aren't low don't run a body
+            "DROP TRIGGER IF EXISTS low_stock_insert",
+            """
+            CREATE TRIGGER IF NOT EXISTS low_stock_insert AFTER INSERT ON inventory
+            WHEN new.quantity <= COALESCE(
+                (SELECT threshold FROM item_thresholds WHERE item_id = new.item_id),
+                (SELECT threshold FROM category_thresholds WHERE category_id = new.category_id))
+            BEGIN
+                INSERT INTO low_stock_alerts (item_id, quantity, threshold, since)
+                VALUES (new.item_id, new.quantity, COALESCE(
+                    (SELECT threshold FROM item_thresholds WHERE item_id = new.item_id),
+                    (SELECT threshold FROM category_thresholds WHERE category_id = new.category_id)),
+                    DATETIME('now', 'localtime'))
+                ON CONFLICT(item_id) DO UPDATE SET quantity = excluded.quantity, threshold = excluded.threshold;
+            END
+            """,
+        ],
+    ),
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+# Applies every pending migration and finishes any pending backfills.
+# Returns True when the schema changed.
+def run_migrations(conn, migrations=MIGRATIONS):
+    start_version = schema_version(conn)
+    while True:
+        run_pending_backfills(conn, migrations)
+        # The version is re-read under a write lock so two processes never
+        # apply the same step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = schema_version(conn)
+            if version >= len(migrations):
+                conn.commit()
+                break
+            migration = migrations[version]
+            for statement in migration.statements:
+                conn.execute(statement)
+            for backfill in migration.backfills:
+                conn.execute("""
+                    INSERT OR IGNORE INTO schema_backfills (version, name)
+                    VALUES (?, ?)
+                """, (version + 1, backfill.name))
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        logging.info("Database migrated to schema version %s: %s", version + 1, migration.description,
+                     extra={"event": "migration"})
+
+    return start_version < schema_version(conn)
+
+
+def run_pending_backfills(conn, migrations=MIGRATIONS):
+    if schema_version(conn) < 2:
+        return  # schema_backfills doesn't exist yet
+
+    pending = conn.execute("""
+        SELECT version, name FROM schema_backfills
+        WHERE completed_at IS NULL ORDER BY version, name
+    """).fetchall()
+    for version, name in pending:
+        backfill = next((b for b in migrations[version - 1].backfills if b.name == name), None)
+        if backfill is None:
+            continue
+        run_backfill(conn, backfill)
+        conn.execute("""
+            UPDATE schema_backfills SET completed_at = DATETIME('now')
+            WHERE version = ? AND name = ?
+        """, (version, name))
+        conn.commit()
+
+
+def run_backfill(conn, backfill, pause=0.0):
+    # Each batch is its own short transaction; the optional pause gives other
+    # connections a chance to take the write lock between batches
+    started = time.perf_counter()
+    total = 0
+    while True:
+        changed = conn.execute(backfill.sql, (backfill.batch_size,)).rowcount
+        conn.commit()
+        total += max(changed, 0)
+        if changed < backfill.batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+    logging.info("Backfill '%s' processed %s rows", backfill.name, total,
+                 extra={"event": "backfill", "duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+    return total
@@ -0,0 +1,167 @@
+# paged_table.py
+# Keeps a ttk.Treeview showing only a sliding window of rows. Pages are fetched
+# with keyset pagination (WHERE key > last_key) so scrolling and refreshing cost
+# the same whether the table holds a hundred rows or a few hundred thousand.
+import bisect
+import time
+from db_worker import deliver
+from metrics import metrics
+
+class PagedTable:
+    def __init__(self, tree, scrollbar, fetch_page, page_size=100, max_pages=4, on_error=None, key_for=None,
+                 name="table"):
+        # fetch_page(after=key, before=key, limit=n) returns a Future (see
+        # db_worker.DatabaseWorker.submit) resolving to rows in display order for
+        # "after" and in reverse display order for "before". key_for(row) gives
+        # the keyset key of a row, by default its first value. name prefixes the
+        # page load timings, e.g. "table.reset".
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.on_error = on_error
+        self.key_for = key_for or (lambda row: row[0])
+        self.name = name
+
+        self.keys = []  # keyset key of every materialized row, in display order
+        self.iids = {}  # item_id -> Treeview iid of every materialized row
+        self.item_ids = {}  # Treeview iid -> item_id, the reverse of iids
+        self.at_start = True
+        self.at_end = True
+        self._loading = False
+        self._generation = 0  # bumped by reset() so stale pages are dropped
+
+        self.tree.configure(yscrollcommand=self.on_scroll)
+
+    def reset(self):
+        # Drop whatever is materialized and load the first page only
+        self._generation += 1
+        self._request(self._show_first_page, "reset", limit=self.page_size)
+
+    def on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self._loading or not self.keys:
+            return
+
+        # Load the neighbouring page once the view gets close to either edge
+        if float(last) > 0.9 and not self.at_end:
+            self.tree.after_idle(self.load_next)
+        elif float(first) < 0.1 and not self.at_start:
+            self.tree.after_idle(self.load_previous)
+
+    def load_next(self):
+        if self._loading or self.at_end or not self.keys:
+            return
+        self._request(self._show_next_page, "next", after=self.keys[-1], limit=self.page_size)
+
+    def load_previous(self):
+        if self._loading or self.at_start or not self.keys:
+            return
+        self._request(self._show_previous_page, "previous", before=self.keys[0], limit=self.page_size)
+
+    def _request(self, handler, kind, **kwargs):
+        self._loading = True
+        generation = self._generation
+        started = time.perf_counter()
+
+        def done(rows):
+            if generation == self._generation:
+                self._loading = False
+                handler(rows)
+                # From the request until the rows are on screen, as the user waits for it
+                metrics.record(f"{self.name}.{kind}", (time.perf_counter() - started) * 1000)
+
+        def failed(error):
+            if generation == self._generation:
+                self._loading = False
+            if self.on_error is not None:
+                self.on_error(error)
+
+        deliver(self.tree, self.fetch_page(**kwargs), done, failed)
+
+    def _show_first_page(self, rows):
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.keys = []
+        self.iids = {}
+        self.item_ids = {}
+
+        self._append(rows)
+        self.at_start = True
+        self.at_end = len(rows) < self.page_size
+
+    def _show_next_page(self, rows):
+        self.at_end = len(rows) < self.page_size
+        self._append(rows)
+
+        # Trim rows from the top and scroll back so the view doesn't jump
+        excess = len(self.keys) - self.max_rows
+        if excess > 0:
+            self._remove(self.tree.get_children()[:excess])
+            del self.keys[:excess]
+            self.at_start = False
+            self.tree.yview_scroll(-excess, "units")
+
+    def _show_previous_page(self, rows):
+        self.at_start = len(rows) < self.page_size
+        rows = [row for row in reversed(rows) if row[0] not in self.iids]
+        for index, row in enumerate(rows):
+            self._insert(index, row)
+        self.keys[:0] = [self.key_for(row) for row in rows]
+
+        # Trim rows from the bottom and keep the same rows in view
+        excess = len(self.keys) - self.max_rows
+        if excess > 0:
+            self._remove(self.tree.get_children()[-excess:])
+            del self.keys[-excess:]
+            self.at_end = False
+        self.tree.yview_scroll(len(rows), "units")
+
+    # Row-level updates after a single save/update/delete. Each one touches at
+    # most one Treeview item; rows outside the loaded window are left to the
+    # next page fetch.
+    def insert_row(self, row):
+        if row[0] in self.iids:
+            self.update_row(row)
+            return
+        key = self.key_for(row)
+        index = bisect.bisect_left(self.keys, key)
+        if (index == 0 and not self.at_start) or (index == len(self.keys) and not self.at_end):
+            return
+        self._insert(index, row)
+        self.keys.insert(index, key)
+
+    def update_row(self, row):
+        iid = self.iids.get(row[0])
+        if iid is not None:
+            self.tree.item(iid, values=row)
+
+    def delete_row(self, item_id):
+        iid = self.iids.get(item_id)
+        if iid is None:
+            return
+        index = self.tree.index(iid)
+        self._remove((iid,))
+        del self.keys[index]
+
+    def item_id_for(self, iid):
+        return self.item_ids[iid]
+
+    def _insert(self, index, row):
+        iid = self.tree.insert("", index, values=row)
+        self.iids[row[0]] = iid
+        self.item_ids[iid] = row[0]
+
+    def _remove(self, iids):
+        for iid in iids:
+            del self.iids[self.item_ids.pop(iid)]
+        self.tree.delete(*iids)
+
+    def _append(self, rows):
+        # Rows inserted row-by-row while the page was in flight are already shown
+        for row in rows:
+            if row[0] not in self.iids:
+                self._insert("end", row)
+                self.keys.append(self.key_for(row))
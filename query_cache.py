@@ -0,0 +1,61 @@
+# query_cache.py
+# Process-wide read cache for inventory queries, keyed by database file, SQL
+# and parameters, so repositories on different files never see each other's
+# rows. Our own writes bump a generation counter that empties it; writes made
+# by other processes are noticed through PRAGMA data_version, which changes
+# for a connection whenever anybody else commits to the file.
+import os
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (database, sql, params) -> rows, least recently used first
+        self._data_versions = {}  # (database, id(connection)) -> last PRAGMA data_version seen
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def check_external_changes(self, conn, database):
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            last = self._data_versions.get((database, id(conn)))
+            self._data_versions[(database, id(conn))] = version
+        if last is not None and last != version:
+            self.invalidate()
+
+    # Returns the cached rows for the query, running it on a miss. database is
+    # the file conn is open on.
+    def fetch(self, conn, database, sql, params=()):
+        database = os.path.abspath(database)
+        self.check_external_changes(conn, database)
+        key = (database, sql, params)
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+            generation = self.generation
+
+        rows = conn.execute(sql, params).fetchall()
+
+        with self._lock:
+            # A write that finished while the query ran may have made it stale
+            if generation == self.generation:
+                self._entries[key] = rows
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return rows
+
+
+inventory_cache = QueryCache()
@@ -0,0 +1,119 @@
+# startup_benchmark.py
+# Measures cold start: how long a fresh interpreter takes to import what the
+# login window needs and to draw that window, plus which imports cost the most
+# (from python -X importtime). Each run is a new process, started in a scratch
+# directory so the real database is left alone, e.g.
+#   python startup_benchmark.py --runs 10 --output startup.json
+# Drawing the window needs a display; without one only the imports are timed.
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Does what main.py does, up to the first drawn frame of the login window
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+from app_shell import AppShell
+from app_logging import setup_logging
+imported = time.perf_counter()
+setup_logging()
+result = {"import_ms": (imported - started) * 1000, "first_window_ms": None, "error": None}
+try:
+    app = AppShell()
+    app.root.update()
+    result["first_window_ms"] = (time.perf_counter() - started) * 1000
+    app.worker.shutdown()
+    app.root.destroy()
+except Exception as e:
+    result["error"] = f"{type(e).__name__}: {e}"
+print(json.dumps(result), flush=True)
+"""
+
+
+# Parses -X importtime output into {module: (self_us, cumulative_us)}
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue  # the header line
+    return modules
+
+
+def run_once(workdir):
+    started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE, REPO_DIR],
+                             cwd=workdir, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    lines = process.stdout.strip().splitlines()
+    if process.returncode != 0 or not lines:
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else "no output"
+        return {"error": error, "process_ms": wall_ms}, {}
+    result = json.loads(lines[-1])
+    result["process_ms"] = wall_ms
+    return result, parse_importtime(process.stderr)
+
+
+def median_of(results, key):
+    values = [result[key] for result in results if result.get(key) is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Grocerify's time to the first window.")
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh processes to start")
+    parser.add_argument("--top", type=int, default=20, help="slowest imports to report")
+    parser.add_argument("--output", default="startup_results.json", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    results = []
+    imports = {}  # module -> cumulative microseconds of every run
+    with tempfile.TemporaryDirectory() as workdir:
+        icon = os.path.join(REPO_DIR, "grocerify_logo.ico")
+        if os.path.exists(icon):
+            shutil.copy(icon, workdir)
+        # The first run creates the scratch database; the rest open an existing one
+        for _ in range(args.runs):
+            result, modules = run_once(workdir)
+            results.append(result)
+            for name, (self_us, cumulative_us) in modules.items():
+                imports.setdefault(name, []).append(cumulative_us)
+
+    slowest = sorted(((statistics.median(times) / 1000, name) for name, times in imports.items()), reverse=True)
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "median_import_ms": median_of(results, "import_ms"),
+        "median_first_window_ms": median_of(results, "first_window_ms"),
+        "median_process_ms": median_of(results, "process_ms"),
+        "errors": sorted({result["error"] for result in results if result.get("error")}),
+        "slowest_imports_ms": {name: round(ms, 3) for ms, name in slowest[:args.top]},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    print(f"imports:      {report['median_import_ms']} ms")
+    print(f"first window: {report['median_first_window_ms']} ms")
+    for error in report["errors"]:
+        print(f"error: {error}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()